@@ -0,0 +1,65 @@
+# announce.py
+# anuncios agrupados: en vez de un mensaje por fichaje, embeds paginados dentro de los límites de
+# discord (descripción <= DESC_LIMIT, <= MAX_EMBEDS embeds y <= MSG_LIMIT caracteres por mensaje)
+import discord
+
+DESC_LIMIT = 4000   # discord: 4096 por descripción
+MSG_LIMIT = 5800    # discord: 6000 sumando todos los embeds de un mensaje
+MAX_EMBEDS = 10
+COLOR = 0x2ecc71
+
+def transfer_line(r):
+    return f"**{r['player']}** → {r['buyer']} por {r['price']}M (vendedor: {r['seller']})"
+
+def pages(lines, limit=DESC_LIMIT):
+    # trozos de líneas enteras que no pasan de limit caracteres
+    page, size = [], 0
+    for line in lines:
+        line = line[:limit]
+        if page and size + len(line) + 1 > limit:
+            yield "\n".join(page)
+            page, size = [], 0
+        page.append(line)
+        size += len(line) + 1
+    if page:
+        yield "\n".join(page)
+
+def embeds(title, lines, color=COLOR, footer=None):
+    # devuelve una lista de mensajes, cada uno una lista de embeds
+    descs = list(pages(lines))
+    msgs, cur, size = [], [], 0
+    for i, d in enumerate(descs):
+        t = title if len(descs) == 1 else f"{title} ({i+1}/{len(descs)})"
+        e = discord.Embed(title=t[:256], description=d, color=color)
+        if footer and i == len(descs) - 1:
+            e.set_footer(text=footer[:2048])
+        n = len(e.title) + len(d) + len(footer or "")
+        if cur and (len(cur) >= MAX_EMBEDS or size + n > MSG_LIMIT):
+            msgs.append(cur)
+            cur, size = [], 0
+        cur.append(e)
+        size += n
+    if cur:
+        msgs.append(cur)
+    return msgs
+
+def transfers(title, results, unsold=(), color=COLOR):
+    lines = [transfer_line(r) for r in results]
+    lines += [f"~~{u['player']}~~ sin fichaje ({u['reason']})" for u in unsold]
+    footer = f"{len(results)} fichajes" + (f", {len(unsold)} sin vender" if unsold else "")
+    return embeds(title, lines, color, footer)
+
+def daily_digest(names, auctions, color=0xf1c40f):
+    # resumen del mercado diario: jugador, vendedor, precio de salida y cierre
+    lines = []
+    for n in names:
+        auc = auctions.get(n)
+        if not auc:
+            continue
+        end = f" · cierra <t:{auc['ends_at']}:R>" if auc.get("ends_at") else ""
+        lines.append(f"**{n}** ({auc['seller_team'] or 'libre'}) · salida {auc['start_price']}M{end}")
+    return embeds("🌟 Mercado diario", lines, color, f"{len(lines)} jugadores en subasta")
+
+def history_entries(results):
+    # lo que se guarda en el historial (un solo append por lote)
+    return [{"player":r["player"],"seller":r["seller"],"buyer":r["buyer"],"price":r["price"]} for r in results]
@@ -0,0 +1,121 @@
+# auction.py
+# motor de subastas: cada subasta guarda su puja máxima ("top") y un libro de pujas
+# ordenado como heap ("book": [[-importe, seq, rol], ...]) -> top en O(1), puja en O(k).
+# el libro guarda solo la mejor puja de cada equipo, así que k <= equipos (y el delta que
+# escribe cada puja en el journal no crece con las repujas)
+import heapq, math, time
+
+BID_INCREMENT = 0.5   # M que hay que superar a la puja máxima
+DURATION = 24*3600     # segundos que dura una subasta (0 = sin fecha, solo !closemarket)
+SNIPE_WINDOW = 5*60    # una puja en los últimos SNIPE_WINDOW segundos...
+SNIPE_EXTENSION = 5*60 # ...alarga la subasta hasta now + SNIPE_EXTENSION
+
+def new(seller_team, start_price, now=None):
+    now = time.time() if now is None else now
+    ends_at = round(now + DURATION) if DURATION else None
+    return {"seller_team":seller_team,"start_price":float(start_price),"top":None,"book":[],"seq":0,"ends_at":ends_at}
+
+def normalize(auc):
+    # subastas antiguas: "bids" era una lista de {"captain_role","amount"} sin ordenar
+    if "book" not in auc:
+        auc["book"] = [[-float(b["amount"]), i, b["captain_role"]] for i, b in enumerate(auc.pop("bids", []))]
+        heapq.heapify(auc["book"])
+        auc["seq"] = len(auc["book"])
+        auc["top"] = None
+        if auc["book"]:
+            a, _, role = auc["book"][0]
+            auc["top"] = {"captain_role":role,"amount":-a}
+    auc.setdefault("top", None)
+    auc.setdefault("ends_at", None)   # las antiguas no vencen solas
+    auc.setdefault("seq", len(auc["book"]))
+    # libros antiguos con varias pujas del mismo equipo: se queda la mejor
+    best = {}
+    for b in auc["book"]:
+        key = b[2].strip().lower()
+        if key not in best or b < best[key]:
+            best[key] = b
+    if len(best) < len(auc["book"]):
+        auc["book"] = list(best.values())
+        heapq.heapify(auc["book"])
+    return auc
+
+def top(auc):
+    return auc.get("top")
+
+def top_amount(auc):
+    t = auc.get("top")
+    return t["amount"] if t else auc["start_price"]
+
+def min_bid(auc, increment=None):
+    inc = BID_INCREMENT if increment is None else increment
+    t = auc.get("top")
+    return round(t["amount"] + inc, 2) if t else auc["start_price"]
+
+def valid_amount(x):
+    # importes de pujas y ofertas: número finito y positivo (float("nan") / "inf" se cuelan por
+    # todas las comparaciones)
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(x) and x > 0
+
+def check_bid(auc, amount, budget=None, increment=None, now=None):
+    # devuelve None si la puja es válida o el mensaje de error
+    if not valid_amount(amount):
+        return "Cantidad no válida."
+    amount = float(amount)
+    now = time.time() if now is None else now
+    if auc.get("ends_at") and now >= auc["ends_at"]:
+        return "La subasta ya ha terminado."
+    if amount < auc["start_price"]:
+        return f"La puja mínima es {auc['start_price']}M."
+    if auc.get("top") and amount < min_bid(auc, increment):
+        return f"Hay que superar la puja actual ({auc['top']['amount']}M) en al menos {BID_INCREMENT if increment is None else increment}M."
+    if budget is not None and amount > budget:
+        return f"No tienes presupuesto: te quedan {budget}M."
+    return None
+
+def place_bid(auc, captain_role, amount, budget=None, increment=None, now=None):
+    now = time.time() if now is None else now
+    err = check_bid(auc, amount, budget, increment, now)
+    if err:
+        return False, err
+    amount = float(amount)
+    # la nueva supera al top, luego también a la anterior del mismo equipo: esa sobra
+    key = captain_role.strip().lower()
+    book = [b for b in auc["book"] if b[2].strip().lower() != key]
+    if len(book) < len(auc["book"]):
+        heapq.heapify(book)
+        auc["book"] = book
+    heapq.heappush(auc["book"], [-amount, auc["seq"], captain_role])
+    auc["seq"] += 1
+    auc["top"] = {"captain_role":captain_role,"amount":amount}
+    # anti-sniping
+    if auc.get("ends_at") and auc["ends_at"] - now < SNIPE_WINDOW:
+        auc["ends_at"] = round(now + SNIPE_EXTENSION)
+        return True, f"Puja registrada. La subasta se alarga hasta <t:{auc['ends_at']}:T>."
+    return True, "Puja registrada."
+
+def ranked(auc):
+    # mejores pujas de mayor a menor, una por equipo (para caer al siguiente si el ganador no puede pagar)
+    # perezoso: solo saca del heap lo que se consume
+    book = list(auc.get("book", []))
+    seen = set()
+    while book:
+        a, _, role = heapq.heappop(book)
+        key = role.strip().lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        yield {"captain_role":role,"amount":-a}
+
+def candidates(auc):
+    # el top primero (O(1), caso normal); solo si no vale se recorre el resto del libro
+    t = auc.get("top")
+    if not t:
+        return
+    yield t
+    for b in ranked(auc):
+        if b["captain_role"].strip().lower() != t["captain_role"].strip().lower():
+            yield b
@@ -0,0 +1,210 @@
+# bench.py
+# benchmark del motor de mercado sin discord: genera una liga sintética en un directorio temporal
+# y mide latencia (p50/p95/p99), ficheros abiertos / bytes de I/O y pico de memoria por operación.
+#   python bench.py --teams 40 --players 20 --auctions 200 --bids 30 --history 20000 --iters 200
+#   python bench.py --storage sqlite --ops pujar,close_market
+# (con sqlite el I/O lo hace la librería de sqlite, no open(): las columnas opens/kb salen a 0)
+import argparse, builtins, json, os, random, shutil, statistics, sys, tempfile, time, tracemalloc
+import store, market, teams, utils, auction
+
+# -----------------------
+# liga sintética
+# -----------------------
+def generate_league(base, n_teams=20, players_per_team=15, n_auctions=50, bids_per_auction=20, history=5000, seed=1):
+    rnd = random.Random(seed)
+    os.makedirs(base, exist_ok=True)
+    players, tms = [], []
+    for t in range(n_teams):
+        tid = f"Equipo {t}"
+        names = []
+        for j in range(players_per_team):
+            name = f"Jugador {t}-{j}"
+            value = round(rnd.uniform(1, 30), 1)
+            players.append({"id":f"T{t}P{j}","name":name,"team":tid,"course":f"{rnd.randint(1,4)}º",
+                            "captain":j == 0,"value":0 if j == 0 else value,"clause":0 if j == 0 else round(value*1.5,2),"blinded":False})
+            names.append(name)
+        tms.append({"id":tid,"name":tid,"captain_role":f"Capitán de {tid}","budget":1000.0,"players":names,"fichajes_hechos":0})
+    auctions = {}
+    pool = [p for p in players if not p["captain"]]
+    now = time.time()
+    for p in rnd.sample(pool, min(n_auctions, len(pool))):
+        auc = auction.new(p["team"], p["value"], now)
+        amount = p["value"]
+        for _ in range(bids_per_auction):
+            bidder = rnd.choice(tms)
+            if bidder["id"] == p["team"]:
+                continue
+            auction.place_bid(auc, bidder["captain_role"], amount, now=now)
+            amount = round(amount + rnd.uniform(0.5, 3), 2)
+        auctions[p["name"]] = auc
+    storage_write = lambda f, d: open(os.path.join(base, f), "w", encoding="utf-8").write(json.dumps(d, ensure_ascii=False, indent=2))
+    storage_write("jugadores.json", players)
+    storage_write("equipos.json", tms)
+    storage_write("mercado.json", {"open":True,"auctions":auctions,"offers":{},"private_offers":{},"dueños":{}})
+    with open(os.path.join(base, "historial.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(history):
+            a, b = rnd.sample(tms, 2)
+            f.write(json.dumps({"player":rnd.choice(pool)["name"],"buyer":a["id"],"seller":b["id"],"price":rnd.randint(1,40),
+                                "date":time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - (history - i)*600))}, ensure_ascii=False) + "\n")
+    return players, tms
+
+# -----------------------
+# contador de I/O: envuelve open() mientras dura la medida
+# -----------------------
+class IOCounter:
+    def __init__(self):
+        self.opens = self.reads = self.writes = self.bytes_read = self.bytes_written = 0
+        self._open = builtins.open
+
+    def __enter__(self):
+        counter = self
+        real_open = self._open
+        class Counted:
+            def __init__(self, f):
+                self._f = f
+            def __getattr__(self, name):
+                return getattr(self._f, name)
+            def __iter__(self):
+                for line in self._f:
+                    counter.bytes_read += len(line)
+                    yield line
+            def __enter__(self):
+                return self
+            def __exit__(self, *a):
+                self._f.close()
+            def read(self, *a):
+                d = self._f.read(*a)
+                counter.bytes_read += len(d)
+                return d
+            def readline(self, *a):
+                d = self._f.readline(*a)
+                counter.bytes_read += len(d)
+                return d
+            def write(self, d):
+                counter.bytes_written += len(d)
+                return self._f.write(d)
+        def counted_open(file, mode="r", *a, **k):
+            counter.opens += 1
+            if any(c in mode for c in "wax+"):
+                counter.writes += 1
+            else:
+                counter.reads += 1
+            return Counted(real_open(file, mode, *a, **k))
+        builtins.open = counted_open
+        return self
+
+    def __exit__(self, *a):
+        builtins.open = self._open
+
+# -----------------------
+# operaciones
+# -----------------------
+def percentile(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+def measure(name, setup, op, iters):
+    lat, io_tot = [], IOCounter()
+    tracemalloc.start()
+    for i in range(iters):
+        arg = setup(i)
+        with IOCounter() as c:
+            t0 = time.perf_counter()
+            op(arg)
+            lat.append((time.perf_counter() - t0) * 1000)
+        for k in ("opens", "reads", "writes", "bytes_read", "bytes_written"):
+            setattr(io_tot, k, getattr(io_tot, k) + getattr(c, k))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"op":name,"iters":iters,"p50":percentile(lat,.5),"p95":percentile(lat,.95),"p99":percentile(lat,.99),
+            "max":max(lat),"mean":statistics.fmean(lat),"opens":io_tot.opens/iters,"writes":io_tot.writes/iters,
+            "kb_read":io_tot.bytes_read/iters/1024,"kb_written":io_tot.bytes_written/iters/1024,"peak_kb":peak/1024}
+
+def run(args):
+    tmp = tempfile.mkdtemp(prefix="ligabench-")
+    rnd = random.Random(args.seed)
+    try:
+        players, tms = generate_league(tmp, args.teams, args.players, args.auctions, args.bids, args.history, args.seed)
+        if args.storage == "sqlite":
+            import storage
+            storage.import_json(tmp)
+        store.STORAGE = args.storage
+        st = store.Store(tmp)
+        store.use(st)
+        st.ensure()
+        pool = [p for p in players if not p["captain"]]
+        auctions0 = {k: json.loads(json.dumps(v)) for k, v in st.market["auctions"].items()}
+        roles = [t["captain_role"] for t in tms]
+        results = []
+
+        def reset_auctions(_):
+            with st.transaction() as tx:
+                tx.m["auctions"] = json.loads(json.dumps(auctions0))
+                for t in st.teams:
+                    if t.get("fichajes_hechos"):
+                        t = dict(t, fichajes_hechos=0)
+                        tx.put_team(t)
+            st.expiries = None
+
+        def pujar_setup(i):
+            name = rnd.choice(list(st.market["auctions"]) or [None])
+            if name is None:
+                reset_auctions(0)
+                name = rnd.choice(list(st.market["auctions"]))
+            auc = st.market["auctions"][name]
+            seller = teams.get_team_by_id(auc["seller_team"])
+            role = rnd.choice([r for r in roles if r != seller["captain_role"]])
+            return name, role, auction.min_bid(auc)
+
+        def transfer_setup(i):
+            p = teams.find_player_by_id(rnd.choice(pool)["id"])
+            buyer = rnd.choice([t for t in tms if t["id"] != p["team"]])
+            t = teams.get_team_by_id(buyer["id"])
+            if t.get("fichajes_hechos", 0) >= 3:
+                teams.update_team(dict(t, fichajes_hechos=0))
+            return p["name"], p["team"], buyer["id"], 1.0
+
+        ops = {
+            "pujar": (pujar_setup, lambda a: market.pujar(*a)),
+            "transfer_player_by_name": (transfer_setup, lambda a: teams.transfer_player_by_name(*a)),
+            "close_market": (reset_auctions, lambda a: market.close_market()),
+            "daily_add_random": (lambda i: None, lambda a: market.daily_add_random(10)),
+            "hist_page": (lambda i: rnd.randint(1, 50), lambda page: utils.hist_page(page, 15)),
+            "hist_page_team": (lambda i: rnd.choice(tms)["id"], lambda team: utils.hist_page(1, 15, team=team)),
+            "save_hist": (lambda i: {"player":rnd.choice(pool)["name"],"buyer":"A","seller":"B","price":1}, utils.save_hist),
+        }
+        wanted = args.ops.split(",") if args.ops else list(ops)
+        for name in wanted:
+            setup, op = ops[name]
+            iters = max(1, args.iters // 10) if name == "close_market" else args.iters
+            results.append(measure(name, setup, op, iters))
+        return results
+    finally:
+        store.use(None)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def report(results, out=sys.stdout):
+    cols = ["op","iters","p50","p95","p99","max","opens","writes","kb_read","kb_written","peak_kb"]
+    out.write(" ".join(f"{c:>24}" if c == "op" else f"{c:>10}" for c in cols) + "\n")
+    for r in results:
+        out.write(" ".join(f"{r[c]:>24}" if c == "op" else f"{r[c]:>10}" if isinstance(r[c], int) else f"{r[c]:>10.3f}" for c in cols) + "\n")
+    out.write("(latencias en ms; opens/writes/kb por operación; peak_kb = pico de memoria Python durante la serie)\n")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark del motor de mercado de la liga")
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=15, help="jugadores por equipo")
+    ap.add_argument("--auctions", type=int, default=50)
+    ap.add_argument("--bids", type=int, default=20, help="pujas por subasta")
+    ap.add_argument("--history", type=int, default=5000)
+    ap.add_argument("--iters", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--storage", choices=["json","sqlite"], default="json")
+    ap.add_argument("--ops", default="", help="lista separada por comas (por defecto todas)")
+    ap.add_argument("--json", action="store_true", help="salida en JSON")
+    args = ap.parse_args()
+    res = run(args)
+    if args.json:
+        print(json.dumps(res, indent=2))
+    else:
+        report(res)
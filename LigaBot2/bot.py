@@ -1,8 +1,10 @@
 # bot.py
-import discord, json, asyncio, os
+import discord, json, asyncio, shlex, datetime, time
+from zoneinfo import ZoneInfo
+from discord import app_commands
 from discord.ext import commands, tasks
 from pathlib import Path
-import market, teams, utils
+import market, teams, utils, store, worker, auction, leagues, roles, offers, notify, announce, search, economy, valuation, metrics, storage, daily, integrity
 
 BASE = Path(__file__).parent
 with open(BASE/"config.json", "r", encoding="utf-8") as f:
@@ -13,48 +15,224 @@ ADMIN_ROLE = CFG.get("ADMIN_ROLE","AdminLiga")
 FICH_CHANNEL = CFG.get("FICHAJES_CHANNEL","fichajes")
 AUTO_ADD = CFG.get("AUTO_DAILY_ADD", True)
 DAILY_ADD_COUNT = CFG.get("DAILY_ADD_COUNT", 10)
+HISTORY_PAGE_SIZE = CFG.get("HISTORY_PAGE_SIZE", 15)
+OFFERS_PAGE_SIZE = CFG.get("OFFERS_PAGE_SIZE", 15)
+DAILY_DIGEST = CFG.get("DAILY_DIGEST", True)   # mercado diario como resumen en embed
+SYNC_SLASH = CFG.get("SYNC_SLASH_COMMANDS", True)
+METRICS_FILE = CFG.get("METRICS_FILE")         # volcado de métricas en formato Prometheus
+METRICS_PORT = CFG.get("METRICS_PORT", 0)      # 0 = sin endpoint http local
+CHECK_ON_START = CFG.get("CHECK_ON_START", True)    # integrity.check de cada liga al arrancar
+REPAIR_ON_START = CFG.get("REPAIR_ON_START", False) # ...y arreglar lo que encuentre
+TZ = ZoneInfo(CFG.get("TIMEZONE", "Europe/Madrid"))
+DAILY_ADD_TIME = datetime.time.fromisoformat(CFG.get("DAILY_ADD_TIME", "10:00")).replace(tzinfo=TZ)
+AUCTION_TICK = CFG.get("AUCTION_TICK_SECONDS", 10)
+store.STORAGE = CFG.get("STORAGE", store.STORAGE)
+auction.BID_INCREMENT = CFG.get("BID_INCREMENT", auction.BID_INCREMENT)
+auction.DURATION = int(CFG.get("AUCTION_HOURS", auction.DURATION/3600) * 3600)
+auction.SNIPE_WINDOW = int(CFG.get("ANTI_SNIPE_MINUTES", auction.SNIPE_WINDOW/60) * 60)
+auction.SNIPE_EXTENSION = int(CFG.get("ANTI_SNIPE_EXTENSION_MINUTES", auction.SNIPE_EXTENSION/60) * 60)
+offers.TTL = int(CFG.get("PRIVATE_OFFER_HOURS", offers.TTL/3600) * 3600)
+leagues.MULTI_LEAGUE = CFG.get("MULTI_LEAGUE", leagues.MULTI_LEAGUE)
+leagues.LEGACY_GUILD_ID = CFG.get("LEGACY_GUILD_ID", leagues.LEGACY_GUILD_ID)
+leagues.LEAGUE_IDLE = CFG.get("LEAGUE_IDLE_MINUTES", leagues.LEAGUE_IDLE/60) * 60
+storage.AUDIT = CFG.get("MARKET_AUDIT", storage.AUDIT)
+valuation.AUTO = CFG.get("AUTO_VALUATION", valuation.AUTO)
+valuation.RULES.update(CFG.get("VALUATION", {}))
+daily.RULES.update(CFG.get("DAILY_RULES", {}))
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+# DMs y anuncios salen por esta cola (notify.py), no dentro del comando
+notifier = notify.Notifier(rate=CFG.get("SEND_RATE", 5), per=CFG.get("SEND_RATE_SECONDS", 1.0))
 
 def user_roles_names(member):
     return [r.name for r in member.roles]
 
 def get_captain_role_of_user(member):
-    # returns the captain role name if found
-    for r in member.roles:
-        if r.name.startswith("Capitán de "):
-            return r.name
-    return None
+    # returns the captain role name if found (cacheado en roles.py)
+    return roles.captain_role(member)
+
+async def resolve_player(ctx, query):
+    # nombre exacto, sin acentos o a medias ("monica", "mon lop"); si hay duda se sugieren nombres
+    p, suggestions = await worker.run(teams.resolve_player, query)
+    if not p:
+        hint = f" ¿Quisiste decir: {', '.join(suggestions)}?" if suggestions else ""
+        await ctx.send("Jugador no encontrado." + hint)
+    return p
 
 async def announce_channel():
-    guilds = bot.guilds
-    if not guilds: return None
-    guild = guilds[0]
+    # canal de fichajes del servidor de la liga activa
+    lg = leagues.current()
+    guild = bot.get_guild(lg.guild_id) if lg and lg.guild_id else None
+    if guild is None and leagues.LEGACY_GUILD_ID:
+        guild = bot.get_guild(leagues.LEGACY_GUILD_ID)
+    if guild is None:
+        guilds = bot.guilds
+        if not guilds: return None
+        guild = guilds[0]
     ch = discord.utils.get(guild.text_channels, name=FICH_CHANNEL)
     return ch
 
+def league_guild_ids():
+    # un guild por liga (sin MULTI_LEAGUE todos comparten la misma)
+    seen = {}
+    for g in bot.guilds:
+        seen.setdefault(leagues.key_for(g.id), g.id)
+    return list(seen.values())
+
+@bot.before_invoke
+async def enter_league(ctx):
+    # cada comando trabaja sobre la liga de su servidor
+    leagues.enter(ctx.guild.id if ctx.guild else None, touch=True)
+    ctx.started = time.perf_counter()
+    # la primera vez la liga se lee del disco: en su hilo, no en el event loop
+    await worker.run(store.get)
+
+@bot.after_invoke
+async def record_command(ctx):
+    # latencia de cada comando (metrics.py), también si ha fallado
+    if getattr(ctx, "started", None) is not None:
+        name = ctx.command.qualified_name
+        metrics.observe("command_ms", (time.perf_counter() - ctx.started) * 1000, command=name)
+        metrics.inc("commands_total", command=name, failed=str(bool(ctx.command_failed)).lower())
+
+# la caché de roles se invalida con los cambios de roles de discord
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        roles.invalidate(after)
+
+@bot.event
+async def on_member_join(member):
+    roles.invalidate(member)
+
+@bot.event
+async def on_member_remove(member):
+    roles.invalidate(member, removed=True)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.name != after.name:
+        roles.invalidate(guild_id=after.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    roles.invalidate(guild_id=role.guild.id)
+
+metrics_server = None
+
 @bot.event
 async def on_ready():
     print(f"Bot listo: {bot.user}")
+    notifier.start()
+    global metrics_server
+    if METRICS_PORT and metrics_server is None:
+        metrics_server = await metrics.serve(METRICS_PORT)
+    if METRICS_FILE and not metrics_dump.is_running():
+        metrics_dump.start()
+    global slash_synced
+    if SYNC_SLASH and not slash_synced:
+        # una vez por arranque (discord limita las sincronizaciones)
+        slash_synced = True
+        try:
+            await bot.tree.sync()
+        except discord.HTTPException as e:
+            print(f"No se pudieron sincronizar los comandos /: {e}")
+    # carga inicial del estado (lee los json y el journal) fuera del event loop
+    for gid in league_guild_ids():
+        leagues.enter(gid)
+        st = await worker.run(store.get)
+        if CHECK_ON_START:
+            problems = await worker.run(integrity.check, st)
+            for p in problems[:20]:
+                print(f"[{gid}] {p['msg']}")
+            if problems and REPAIR_ON_START:
+                print(f"[{gid}] {await worker.run(integrity.repair, st, problems)} arreglos aplicados")
+    if not auction_timer.is_running():
+        auction_timer.start()
     if AUTO_ADD:
         if not daily_add_task.is_running():
             daily_add_task.start()
+        # si el bot estaba apagado a la hora del mercado diario, se hace ahora (una vez por día)
+        if datetime.datetime.now(TZ).timetz() >= DAILY_ADD_TIME:
+            await daily_add_task()
 
 # -----------------------
 # DAILY ADD TASK
 # -----------------------
-@tasks.loop(hours=24)
+# a una hora fija (DAILY_ADD_TIME), no cada 24h desde el arranque: así no se desplaza al reiniciar
+@tasks.loop(time=DAILY_ADD_TIME)
 async def daily_add_task():
     await bot.wait_until_ready()
-    names = market.daily_add_random(DAILY_ADD_COUNT)
+    # un fallo en una liga no debe parar la tarea ni saltarse las demás
+    for gid in league_guild_ids():
+        try:
+            await daily_add_league(gid)
+        except Exception as e:
+            print(f"[{gid}] Error en el mercado diario: {e!r}")
+
+async def daily_add_league(gid):
+    leagues.enter(gid)
+    # el mismo "hoy" (en TZ) para comprobar y para lo que guarda market (last_daily, daily_seen)
+    today = datetime.datetime.now(TZ).strftime("%Y-%m-%d")
+    if (await worker.run(store.get)).market.get("last_daily") == today:
+        return
+    names = await worker.run(market.daily_add_random, DAILY_ADD_COUNT, today=today)
     if not names:
         return
     ch = await announce_channel()
-    if ch:
-        await ch.send(f"🌟 **Mercado diario**: se han añadido {len(names)} jugadores al mercado (subasta):\n" + ", ".join(names))
+    if ch and DAILY_DIGEST:
+        notifier.send_pages(ch, announce.daily_digest(names, (await worker.run(market.read))["auctions"]))
+    elif ch:
+        notifier.send(ch, f"🌟 **Mercado diario**: se han añadido {len(names)} jugadores al mercado (subasta):\n" + ", ".join(names))
+
+# -----------------------
+# AUCTION TIMER: cierra las subastas al llegar su ends_at
+# -----------------------
+@tasks.loop(seconds=AUCTION_TICK)
+async def auction_timer():
+    # next_expiry es O(1) (cima del heap): el tick no cuesta nada si no vence ninguna.
+    # ligas cargadas + ligas descargadas que tienen alguna subasta vencida
+    now = time.time()
+    # tasks.Loop se para para siempre ante cualquier excepción que no sea de red: cada liga va aparte
+    for key in [lg.guild_id for lg in leagues.loaded()] + leagues.due_sleeping(now):
+        try:
+            await expire_league(key, now)
+        except Exception as e:
+            print(f"[{key}] Error cerrando subastas: {e!r}")
+    # descarga las ligas sin actividad (guarda antes su próximo vencimiento)
+    try:
+        await leagues.evict_idle(now, market.next_expiry)
+    except Exception as e:
+        print(f"Error descargando ligas: {e!r}")
+
+async def expire_league(key, now):
+    leagues.enter(key)
+    nxt_offer = await worker.run(market.next_offer_expiry)
+    if nxt_offer is not None and nxt_offer <= now:
+        await worker.run(market.sweep_private_offers, now)
+    nxt = await worker.run(market.next_expiry)
+    if nxt is None or nxt > now:
+        return
+    results, unsold = await worker.run(market.settle_expired)
+    # las subastas ya están cerradas: si falla el historial, se anuncian igual
+    try:
+        await worker.run(utils.save_hist_many, announce.history_entries(results))
+    except Exception as e:
+        print(f"[{key}] Error guardando el historial: {e!r}")
+    ch = await announce_channel()
+    if ch and (results or unsold):
+        notifier.send_pages(ch, announce.transfers("⏰ Subastas cerradas", results, unsold))
+
+@auction_timer.before_loop
+async def before_auction_timer():
+    await bot.wait_until_ready()
+
+@tasks.loop(seconds=60)
+async def metrics_dump():
+    await asyncio.to_thread(metrics.dump, METRICS_FILE)
 
 # -----------------------
 # ADMIN: open/close market
@@ -63,23 +241,74 @@ async def daily_add_task():
 async def openmarket(ctx):
     if ADMIN_ROLE not in user_roles_names(ctx.author):
         return await ctx.send("❌ Solo admins.")
-    market.open_market()
+    await worker.run(market.open_market)
     await ctx.send("🟢 Mercado abierto.")
     ch = await announce_channel()
     if ch:
-        await ch.send("🟢 El mercado ha sido abierto por la organización.")
+        notifier.send(ch, "🟢 El mercado ha sido abierto por la organización.")
 
 @bot.command()
-async def closemarket(ctx):
+async def closemarket(ctx, modo: str = ""):
+    # !closemarket preview -> enseña qué fichajes saldrían sin cerrar nada
     if ADMIN_ROLE not in user_roles_names(ctx.author):
         return await ctx.send("❌ Solo admins.")
-    results = market.close_market()
+    if modo.lower() in ("preview","simular","dry"):
+        results, unsold = await worker.run(market.close_market, True)
+        lines = [f"{r['buyer']} ← {r['player']} por {r['price']}M (vendedor: {r['seller']})" for r in results]
+        lines += [f"{u['player']}: sin fichaje ({u['reason']})" for u in unsold]
+        return await ctx.send("🔎 Vista previa del cierre:\n```" + ("\n".join(lines) or "Nada que resolver.")[:1900] + "```")
+    results = await worker.run(market.close_market)
+    # todo el cierre en un append al historial y en unos pocos embeds
+    await worker.run(utils.save_hist_many, announce.history_entries(results))
     await ctx.send("🔴 Mercado cerrado.")
     ch = await announce_channel()
-    if ch:
-        for r in results:
-            await ch.send(f"💰 **FICHAJE**: {r['buyer']} ha fichado a **{r['player']}** por {r['price']}M (vendedor: {r['seller']})")
-            utils.save_hist({"player":r['player'],"seller":r['seller'],"buyer":r['buyer'],"price":r['price']})
+    if ch and results:
+        notifier.send_pages(ch, announce.transfers("💰 Fichajes del cierre de mercado", results))
+
+@bot.command()
+async def entregas(ctx):
+    # estado de la cola de DMs / anuncios
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    counts = notifier.summary()
+    fails = [d for d in notifier.status.values() if d.status in ("fallido","bloqueado")][-5:]
+    lines = [", ".join(f"{k}: {v}" for k, v in counts.items()) or "Nada enviado aún."]
+    lines += [f"#{d.id} {d.status} → {getattr(d.target, 'name', d.target.id)}: {d.error}"[:200] for d in fails]
+    await ctx.send("📬 Entregas:\n" + "\n".join(lines))
+
+@bot.command()
+async def stats(ctx, modo: str = ""):
+    # !stats -> latencias y contadores (metrics.py); !stats reset -> a cero
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    if modo.lower() == "reset":
+        metrics.REG.reset()
+        return await ctx.send("✅ Métricas a cero.")
+    def row(label, h):
+        return f"{label[:28]:<28} n={h.n:<6} media={h.total / h.n:7.1f}ms p50≤{h.quantile(0.5):g} p95≤{h.quantile(0.95):g}"
+    lines = ["Comandos:"]
+    cmds = sorted(metrics.REG.histograms("command_ms"), key=lambda x: -x[1].n)
+    lines += [row(l["command"], h) for l, h in cmds[:10]] or ["  (ninguno)"]
+    lines.append("Worker (por tiempo total):")
+    calls = sorted(metrics.REG.histograms("worker_call_ms"), key=lambda x: -x[1].total)
+    lines += [row(l["fn"], h) for l, h in calls[:6]]
+    lines += [row("cola del worker", h) for _, h in metrics.REG.histograms("worker_queue_ms")]
+    lines += [row(f"lock {l['kind']}", h) for l, h in metrics.REG.histograms("lock_wait_ms")]
+    lines += [row("envío a discord", h) for _, h in metrics.REG.histograms("discord_send_ms")]
+    lines.append("Ficheros:")
+    nbytes = {(l["file"], l["op"]): v for l, v in metrics.REG.totals("file_bytes_total")}
+    for l, h in sorted(metrics.REG.histograms("file_io_ms"), key=lambda x: -x[1].total)[:8]:
+        kb = nbytes.get((l["file"], l["op"]), 0) / 1024
+        lines.append(row(f"{l['op']} {l['file']}", h) + f" {kb:.0f}KB")
+    await ctx.send("📊 Métricas:\n```" + "\n".join(lines)[:1900] + "```")
+
+@bot.command()
+async def recargar(ctx):
+    # vuelve a leer jugadores/equipos del disco (tras editar los json a mano)
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    await worker.run(store.reload)
+    await ctx.send("🔄 Datos de la liga recargados.")
 
 # -----------------------
 # Capitán: poner en venta (public)
@@ -87,6 +316,7 @@ async def closemarket(ctx):
 @bot.command()
 async def ponerventa(ctx, *, args: str):
     # usage: !ponerventa NombreJugador precio [locked=yes/no]
+    # locked=yes: se anuncia pero no se puede !comprar, solo con oferta privada
     # only captain role allowed
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
@@ -100,24 +330,67 @@ async def ponerventa(ctx, *, args: str):
             locked = parts[2].lower() in ("yes","si","true","1")
     except:
         return await ctx.send("Uso: !ponerventa NombreJugador precio [locked=yes]")
+    await put_on_sale(ctx, name, price, locked)
 
+async def put_on_sale(ctx, name, price, locked=False):
     # find player's id and check belongs to team
-    t = teams.get_team_by_captain_role(cap_role)
-    if not t:
-        return await ctx.send("No se ha encontrado tu equipo.")
-    p = teams.find_player_by_name(name)
+    # (lock del jugador: que nadie lo fiche entre la comprobación y la publicación)
+    if not auction.valid_amount(price):
+        return await ctx.send("❌ Precio no válido.")
+    p = await resolve_player(ctx, name)
     if not p:
-        return await ctx.send("Jugador no encontrado.")
-    if p["team"] != t["id"]:
-        return await ctx.send("Ese jugador no es de tu equipo.")
-    if p.get("blinded"):
-        return await ctx.send("Jugador blindado. No puede ponerse a la venta.")
-    ok = market.post_public_offer(p["id"], p["name"], t["id"], price, locked)
+        return
+    async with worker.lock("player", p["name"]):
+        t = roles.team(ctx.author)
+        if not t:
+            return await ctx.send("No se ha encontrado tu equipo.")
+        p = await worker.run(teams.find_player_by_name, p["name"])
+        if p["team"] != t["id"]:
+            return await ctx.send("Ese jugador no es de tu equipo.")
+        if p.get("blinded"):
+            return await ctx.send("Jugador blindado. No puede ponerse a la venta.")
+        ok = await worker.run(market.post_public_offer, p["id"], p["name"], t["id"], price, locked)
     if ok:
         await ctx.send(f"✅ {p['name']} puesto en venta por {price}M (locked={locked}).")
     else:
         await ctx.send("❌ Error al publicar oferta.")
 
+@bot.command()
+async def quitarventa(ctx, *, player_name: str):
+    # retira la oferta pública de un jugador de tu equipo
+    t = roles.team(ctx.author)
+    if not t:
+        return await ctx.send("❌ Solo capitanes.")
+    p = await resolve_player(ctx, player_name)
+    if not p:
+        return
+    o = await worker.run(market.get_public_offer, p["name"])
+    if not o or o["seller"] != t["id"]:
+        return await ctx.send("❌ No tienes ese jugador en venta.")
+    await worker.run(market.remove_public_offer, p["name"])
+    await ctx.send(f"✅ {p['name']} retirado del mercado.")
+
+# -----------------------
+# Capitán: comprar una oferta pública al precio publicado
+# -----------------------
+@bot.command()
+async def comprar(ctx, *, player_name: str):
+    cap_role = get_captain_role_of_user(ctx.author)
+    if not cap_role:
+        return await ctx.send("❌ Solo capitanes pueden comprar.")
+    p = await resolve_player(ctx, player_name)
+    if not p:
+        return
+    async with worker.lock("player", p["name"]):
+        ok, res = await worker.run(market.buy_public_offer, cap_role, p["name"])
+    if not ok:
+        return await ctx.send(f"❌ {res}")
+    ch = await announce_channel()
+    if ch:
+        notifier.send(ch, f"💰 **FICHAJE**: {res['buyer']} compra a **{res['player']}** por {res['price']}M (vendedor: {res['seller']})")
+    await worker.run(utils.save_hist, res)
+    await ctx.send(f"✅ Has comprado a {res['player']} por {res['price']}M.")
+
 # -----------------------
 # Capitán: post private offer
 # -----------------------
@@ -126,43 +399,66 @@ async def ofertaprivada(ctx, target_rol: str, player_name: str, price: float):
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
         return await ctx.send("❌ Solo capitanes pueden enviar ofertas privadas.")
+    if not auction.valid_amount(price):
+        return await ctx.send("❌ Precio no válido.")
     # target_rol should match exact role name; e.g. "Capitán de Betis FC"
-    p = teams.find_player_by_name(player_name)
+    p = await worker.run(teams.find_player_by_name, player_name)
     if not p:
         return await ctx.send("Jugador no encontrado.")
     if p.get("blinded"):
         return await ctx.send("Jugador blindado.")
-    # post private offer
-    market.post_private_offer(target_rol, p["name"], cap_role, price)
+    # post private offer (sustituye a la misma oferta si ya la habías enviado)
+    oid = await worker.run(market.post_private_offer, target_rol, p["name"], cap_role, price)
     # DM the target (if member exists)
-    # find member with that role in server
-    guild = ctx.guild
-    members = [m for m in guild.members if any(r.name==target_rol for r in m.roles)]
-    for m in members:
-        try:
-            await m.send(f"📩 Oferta privada: {ctx.author.display_name} ofrece {price}M por **{p['name']}**. Para aceptar escribe: `!aceptar_privada \"{p['name']}\"`")
-        except:
-            pass
-    await ctx.send("✅ Oferta privada enviada (si el capitán está en el servidor le llegará por DM).")
+    notifier.dm_role(ctx.guild, target_rol, f"📩 Oferta privada #{oid}: {ctx.author.display_name} ofrece {price}M por **{p['name']}**. Para aceptar escribe: `!aceptar_privada {oid}` (contraoferta: `!contraoferta {oid} precio`)")
+    await ctx.send(f"✅ Oferta privada #{oid} enviada (si el capitán está en el servidor le llegará por DM).")
 
 # -----------------------
 # Capitán: accept private offer
 # -----------------------
 @bot.command()
 async def aceptar_privada(ctx, *, player_name: str):
+    # !aceptar_privada <id> o !aceptar_privada NombreJugador (la más reciente)
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
         return await ctx.send("❌ Solo capitanes pueden aceptar ofertas.")
-    ok, res = market.accept_private_offer(cap_role, player_name)
+    o = await worker.run(market.find_private_offer, cap_role, player_name)
+    if not o:
+        return await ctx.send("❌ No tienes esa oferta.")
+    async with worker.lock("player", o["player_name"]):
+        ok, res = await worker.run(market.accept_private_offer, cap_role, o["id"])
     if not ok:
         return await ctx.send(f"❌ {res}")
     # announce and save history
     ch = await announce_channel()
     if ch:
-        await ch.send(f"💰 **FICHAJE PRIVADO**: {res['buyer']} compra a **{res['player']}** por {res['price']}M (vendedor: {res['seller']})")
-    utils.save_hist(res)
+        notifier.send(ch, f"💰 **FICHAJE PRIVADO**: {res['buyer']} compra a **{res['player']}** por {res['price']}M (vendedor: {res['seller']})")
+    await worker.run(utils.save_hist, res)
     await ctx.send("✅ Oferta privada aceptada y fichaje realizado.")
 
+@bot.command()
+async def contraoferta(ctx, oferta: str, price: float):
+    cap_role = get_captain_role_of_user(ctx.author)
+    if not cap_role:
+        return await ctx.send("❌ Solo capitanes.")
+    if not auction.valid_amount(price):
+        return await ctx.send("❌ Precio no válido.")
+    ok, res = await worker.run(market.counter_private_offer, cap_role, oferta, price)
+    if not ok:
+        return await ctx.send(f"❌ {res}")
+    notifier.dm_role(ctx.guild, res["target_role"], f"📩 Contraoferta #{res['id']}: {ctx.author.display_name} propone {price}M por **{res['player_name']}**. Para aceptar escribe: `!aceptar_privada {res['id']}`")
+    await ctx.send(f"✅ Contraoferta #{res['id']} enviada.")
+
+@bot.command()
+async def retirar_privada(ctx, oferta: str):
+    cap_role = get_captain_role_of_user(ctx.author)
+    if not cap_role:
+        return await ctx.send("❌ Solo capitanes.")
+    ok, res = await worker.run(market.withdraw_private_offer, cap_role, oferta)
+    if not ok:
+        return await ctx.send(f"❌ {res}")
+    await ctx.send(f"✅ Oferta #{res['id']} retirada.")
+
 # -----------------------
 # Capitán: pujar en auction
 # -----------------------
@@ -171,10 +467,16 @@ async def pujar(ctx, player_name: str, amount: float):
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
         return await ctx.send("❌ Solo capitanes pueden pujar.")
-    ok,msg = market.pujar(player_name, cap_role, amount)
+    if not auction.valid_amount(amount):
+        return await ctx.send("❌ Cantidad no válida.")
+    p = await resolve_player(ctx, player_name)
+    if not p:
+        return
+    async with worker.lock("auction", p["name"]):
+        ok,msg = await worker.run(market.pujar, p["name"], cap_role, amount)
     if not ok:
         return await ctx.send(f"❌ {msg}")
-    await ctx.send("✅ Puja registrada.")
+    await ctx.send(f"✅ {msg}")
 
 # -----------------------
 # Capitán: clausulazo (paga 1.5x valor)
@@ -184,14 +486,18 @@ async def clausulazo(ctx, *, player_name: str):
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
         return await ctx.send("❌ Solo capitanes.")
-    ok, res = market.pay_clause_and_transfer(player_name, cap_role)
+    p = await resolve_player(ctx, player_name)
+    if not p:
+        return
+    async with worker.lock("player", p["name"]):
+        ok, res = await worker.run(market.pay_clause_and_transfer, p["name"], cap_role)
     if not ok:
         return await ctx.send(f"❌ {res}")
     # announce
     ch = await announce_channel()
     if ch:
-        await ch.send(f"💥 **CLAUSULA PAGADA**: {res['buyer']} ha pagado {res['price']}M y fichado a **{res['player']}** (vendedor: {res['seller']})")
-    utils.save_hist(res)
+        notifier.send(ch, f"💥 **CLAUSULA PAGADA**: {res['buyer']} ha pagado {res['price']}M y fichado a **{res['player']}** (vendedor: {res['seller']})")
+    await worker.run(utils.save_hist, res)
     await ctx.send("✅ Clausula pagada, jugador transferido.")
 
 # -----------------------
@@ -209,12 +515,14 @@ async def asignar_valores(ctx, *pairs):
     items = []
     total = 0
     for i in range(0,len(pairs),2):
-        name = pairs[i]
-        try:
-            val = float(pairs[i+1])
-        except:
-            return await ctx.send("Error en los valores. Usa números.")
-        items.append((name,val))
+        # se validan todos antes de tocar ninguno
+        if not auction.valid_amount(pairs[i+1]):
+            return await ctx.send("Error en los valores. Usa números positivos.")
+        val = float(pairs[i+1])
+        p = await resolve_player(ctx, pairs[i])
+        if not p:
+            return
+        items.append((p["name"],val))
         total += val
     if total > 60:
         return await ctx.send("❌ El total supera 60M.")
@@ -222,44 +530,60 @@ async def asignar_valores(ctx, *pairs):
         return await ctx.send("❌ Máximo 3 jugadores.")
     # apply values: only players that are NOT captains and not blind
     changed = []
-    players = teams.load_players()
-    for name,val in items:
-        p = teams.find_player_by_name(name)
-        if not p:
-            return await ctx.send(f"Jugador {name} no encontrado.")
-        if p.get("captain"):
-            return await ctx.send(f"No puedes asignar valor a un capitán: {name}")
-        if p.get("blinded"):
-            return await ctx.send(f"No puedes asignar valor a blindado: {name}")
-        p["value"] = float(val)
-        p["clause"] = round(float(val)*1.5,2)
-        teams.update_player(p)
-        changed.append(f"{name} -> {val}M (cláusula {p['clause']}M)")
+    async with worker.locked(*[("player", name) for name,_ in items]):
+        found = [(await worker.run(teams.find_player_by_name, name), val) for name,val in items]
+        for p,_ in found:
+            if p.get("captain"):
+                return await ctx.send(f"No puedes asignar valor a un capitán: {p['name']}")
+            if p.get("blinded"):
+                return await ctx.send(f"No puedes asignar valor a blindado: {p['name']}")
+        for p,val in found:
+            p["value"] = float(val)
+            p["clause"] = valuation.clause_of(val)
+            changed.append(f"{p['name']} -> {val}M (cláusula {p['clause']}M)")
+        # una sola transacción: o se asignan todos o ninguno
+        await worker.run(teams.update_players, [p for p,_ in found])
     await ctx.send("✅ Valores asignados:\n" + "\n".join(changed))
 
 # -----------------------
 # Comandos info
 # -----------------------
 @bot.command()
-async def ofertas(ctx):
-    m = market.read()
-    res = []
-    for o in m.get("offers",[]):
-        res.append(f"{o['player_name']} | vendedor: {o['seller']} | price: {o['price']}M | locked:{o.get('locked',False)}")
-    if not res:
-        return await ctx.send("No hay ofertas públicas.")
-    await ctx.send("```" + "\n".join(res) + "```")
+async def ofertas(ctx, *, args: str = ""):
+    # usage: !ofertas [pagina] [equipo="Betis FC"] [min=5] [max=20] [orden=desc]
+    page, filt = 1, {}
+    try:
+        for tok in shlex.split(args):
+            k, sep, v = tok.partition("=")
+            if not sep:
+                page = int(tok)
+            elif k.lower() in ("equipo","team"):
+                filt["seller"] = v
+            elif k.lower() == "min":
+                filt["lo"] = float(v)
+            elif k.lower() == "max":
+                filt["hi"] = float(v)
+            elif k.lower() == "orden":
+                filt["desc"] = v.lower() in ("desc","-precio","mayor")
+            else:
+                raise ValueError(tok)
+    except ValueError:
+        return await ctx.send('Uso: !ofertas [pagina] [equipo="Equipo"] [min=precio] [max=precio] [orden=asc|desc]')
+    rows, total, pages = await worker.run(market.list_public_offers, page, OFFERS_PAGE_SIZE, **filt)
+    if not rows:
+        return await ctx.send("No hay ofertas públicas con esos filtros." if filt else "No hay ofertas públicas.")
+    res = [f"{o['player_name']} | vendedor: {o['seller']} | price: {o['price']}M | locked:{o.get('locked',False)}" for o in rows]
+    page = min(max(1, page), pages)
+    await ctx.send("```" + "\n".join(res)[:1900] + f"```Página {page}/{pages} ({total} ofertas) · compra con `!comprar Jugador`")
 
 @bot.command()
 async def auctions(ctx):
-    m = market.read()
+    m = await worker.run(market.read)
     if not m.get("auctions"):
         return await ctx.send("No hay subastas activas.")
     out=[]
     for pname,auc in m["auctions"].items():
-        bids = auc.get("bids",[])
-        top = max([b["amount"] for b in bids]) if bids else auc["start_price"]
-        out.append(f"{pname} | vendedor: {auc['seller_team']} | top: {top}M")
+        out.append(f"{pname} | vendedor: {auc['seller_team']} | top: {auction.top_amount(auc)}M | mínimo: {auction.min_bid(auc)}M")
     await ctx.send("```" + "\n".join(out) + "```")
 
 @bot.command()
@@ -267,22 +591,255 @@ async def private_offers(ctx):
     cap_role = get_captain_role_of_user(ctx.author)
     if not cap_role:
         return await ctx.send("❌ Solo capitanes.")
-    lst = market.get_private_offers_for(cap_role)
+    lst = await worker.run(market.get_private_offers_for, cap_role)
     if not lst:
         return await ctx.send("No tienes ofertas privadas.")
-    s = "\n".join([f"{o['seller_role']} ofrece {o['price']}M por {o['player_name']}" for o in lst])
+    def line(o):
+        exp = f" (caduca <t:{o['expires_at']}:R>)" if o.get("expires_at") else ""
+        tag = "contraoferta de" if o.get("counter_of") else "oferta de"
+        return f"#{o['id']} {tag} {o['from_role']}: {o['player_name']} por {o['price']}M{exp}"
+    s = "\n".join(line(o) for o in lst)
     await ctx.author.send("Tus ofertas privadas:\n" + s)
     await ctx.send("✅ Te he enviado tus ofertas privadas por DM.")
 
 @bot.command()
-async def history(ctx):
-    hist = utils.read_hist()
+async def saldo(ctx):
+    # presupuesto, retenido por pujas y disponible (O(1), del libro en memoria)
+    tid = roles.team_id(ctx.author)
+    if not tid:
+        return await ctx.send("❌ Solo capitanes.")
+    st = await worker.run(store.get)
+    bal, held, avail = await worker.run(economy.summary, st, tid)
+    await ctx.send(f"💶 {tid}: saldo {bal}M · retenido {held}M · disponible {avail}M")
+
+@bot.command()
+async def conciliar(ctx, modo: str = ""):
+    # !conciliar -> compara el libro de cuentas con los presupuestos; !conciliar ajustar -> apunta ajustes
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    st = await worker.run(store.get)
+    rep = await worker.run(economy.reconcile, st)
+    if not rep["problems"]:
+        return await ctx.send(f"✅ Cuentas cuadradas ({rep['entries']} apuntes, suma {economy.money(rep['total'])}M).")
+    lines = [f"{p['team']}: presupuesto {economy.money(p['budget'])}M, libro {economy.money(p['ledger'])}M" for p in rep["problems"]]
+    if modo.lower() in ("ajustar","fix"):
+        await worker.run(economy.adjust, st, rep["problems"])
+        return await ctx.send("🛠️ Ajustes apuntados:\n```" + "\n".join(lines)[:1900] + "```")
+    await ctx.send("⚠️ Descuadres (usa `!conciliar ajustar` si los presupuestos son correctos):\n```" + "\n".join(lines)[:1800] + "```")
+
+@bot.command()
+async def verificar(ctx, modo: str = ""):
+    # !verificar -> plantillas, dueños, ofertas y subastas (integrity.py); !verificar reparar -> arregla;
+    # !verificar completo -> además el libro de cuentas
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    st = await worker.run(store.get)
+    t0 = time.perf_counter()
+    problems = await worker.run(integrity.check, st, modo.lower() == "completo")
+    ms = (time.perf_counter() - t0) * 1000
+    if not problems:
+        return await ctx.send(f"✅ Liga consistente ({len(st.players)} jugadores, {len(st.teams)} equipos, {ms:.1f}ms).")
+    lines = [("🛠️ " if p["fix"] else "ℹ️ " if p["kind"] in integrity.WARNINGS else "👀 ") + p["msg"] for p in problems]
+    if modo.lower() in ("reparar","fix"):
+        n = await worker.run(integrity.repair, st, problems)
+        left = [l for l in lines if l.startswith("👀")]
+        return await ctx.send(f"🛠️ {n} arreglos aplicados." + ("\nA mano:\n```" + "\n".join(left)[:1800] + "```" if left else ""))
+    await ctx.send(f"⚠️ {len(problems)} inconsistencias ({ms:.1f}ms; 🛠️ = `!verificar reparar` lo arregla):\n```" + "\n".join(lines)[:1800] + "```")
+
+@bot.command()
+async def revalorar(ctx):
+    # recalcula valor y cláusula de todos los jugadores desde el historial (valuation.py)
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    changes = await worker.run(market.revalue_all)
+    if not changes:
+        return await ctx.send("✅ Valores al día, nada que cambiar.")
+    names = await worker.run(teams.names_by_id)
+    lines = [f"{names.get(pid, pid)}: {value}M (cláusula {clause}M)" for pid, value, clause in changes]
+    await ctx.send(f"📈 {len(changes)} jugadores revalorados:\n```" + "\n".join(lines)[:1800] + "```")
+
+@bot.command()
+async def auditoria(ctx, *, player_name: str):
+    # !auditoria Jugador -> subastas, pujas, ventas, ofertas y dueños del jugador (deltas guardados)
+    if ADMIN_ROLE not in user_roles_names(ctx.author):
+        return await ctx.send("❌ Solo admins.")
+    p = await resolve_player(ctx, player_name)
+    if not p:
+        return
+    events = await worker.run(market.audit_trail, p["name"])
+    if not events:
+        return await ctx.send(f"No hay movimientos de {p['name']}.")
+    lines = [f"[{datetime.datetime.fromtimestamp(ts, TZ):%Y-%m-%d %H:%M}] {text}" for ts, text in events]
+    await ctx.send(f"🔍 {p['name']}:\n```" + "\n".join(lines)[-1900:] + "```")
+
+@bot.command()
+async def history(ctx, *, args: str = ""):
+    # usage: !history [pagina] [equipo="Betis FC"] [jugador="Xabi"] [desde=2025-01-01] [hasta=2025-02-01]
+    page, filt = 1, {}
+    try:
+        for tok in shlex.split(args):
+            k, sep, v = tok.partition("=")
+            if not sep:
+                page = int(tok)
+            elif k.lower() in ("equipo","team"):
+                filt["team"] = v
+            elif k.lower() in ("jugador","player"):
+                filt["player"] = v
+            elif k.lower() in ("desde","hasta"):
+                filt[k.lower()] = v
+            else:
+                raise ValueError(tok)
+    except ValueError:
+        return await ctx.send('Uso: !history [pagina] [equipo="Equipo"] [jugador="Jugador"] [desde=AAAA-MM-DD] [hasta=AAAA-MM-DD]')
+    hist, total, pages = await worker.run(utils.hist_page, page, HISTORY_PAGE_SIZE, **filt)
     if not hist:
-        return await ctx.send("No hay fichajes aún.")
+        return await ctx.send("No hay fichajes con esos filtros." if filt else "No hay fichajes aún.")
     lines = []
     for h in hist:
-        lines.append(f"{h['buyer']} fichó a {h['player']} por {h['price']}M (v: {h.get('seller')})")
-    await ctx.send("```" + "\n".join(lines) + "```")
+        fecha = f"[{h['date'][:10]}] " if h.get("date") else ""
+        lines.append(f"{fecha}{h['buyer']} fichó a {h['player']} por {h['price']}M (v: {h.get('seller')})")
+    page = min(max(1, page), pages)
+    await ctx.send("```" + "\n".join(lines)[:1900] + f"```Página {page}/{pages} ({total} fichajes)")
+
+# -----------------------
+# Comandos / (slash): parámetros con tipo y autocompletado desde el estado en memoria.
+# Reutilizan los comandos de arriba con un contexto mínimo sobre la interacción.
+# -----------------------
+slash_synced = False
+
+class SlashCtx:
+    # lo que usan los comandos de commands.Context: author, guild, channel y send
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.author, self.guild, self.channel = interaction.user, interaction.guild, interaction.channel
+
+    async def send(self, content=None, **kw):
+        return await self.interaction.followup.send(content, **kw)
+
+async def run_slash(interaction, cmd, *args, **kw):
+    # before/after_invoke no corren con las interacciones: la liga y las métricas van aquí
+    leagues.enter(interaction.guild_id, touch=True)
+    t0, failed = time.perf_counter(), True
+    try:
+        await interaction.response.defer()
+        await worker.run(store.get)
+        await cmd.callback(SlashCtx(interaction), *args, **kw)
+        failed = False
+    except Exception as e:
+        # sin respuesta la interacción se queda en "pensando…" para siempre
+        print(f"[{interaction.guild_id}] Error en /{cmd.name}: {e!r}")
+        try:
+            await interaction.followup.send("❌ Ha habido un error ejecutando el comando.", ephemeral=True)
+        except discord.HTTPException:
+            pass
+    finally:
+        metrics.observe("command_ms", (time.perf_counter() - t0) * 1000, command="/" + cmd.name)
+        metrics.inc("commands_total", command="/" + cmd.name, failed=str(failed).lower())
+
+def ac_league(interaction):
+    # autocompletar llega con cada tecla: solo ligas ya cargadas, nunca se lee del disco por él
+    lg = leagues.peek(interaction.guild_id)
+    if lg is not None:
+        leagues.enter(interaction.guild_id)
+    return lg
+
+def choices(names):
+    return [app_commands.Choice(name=n[:100], value=n[:100]) for n in names[:25]]
+
+# búsquedas del autocompletar: van por worker.run, en el hilo de la liga
+def names_like(query, n):
+    return [x for x, _ in store.get().name_index().search(query, n)]
+
+def own_players_like(member, query):
+    st, tid = store.get(), roles.team_id(member)
+    return [n for n in names_like(query, 200) if st.p_by_name.get(store.norm(n), {}).get("team") == tid]
+
+def auctions_like(query):
+    auctions = store.get().market["auctions"]
+    return list(auctions) if not query else [n for n in names_like(query, 200) if n in auctions]
+
+def captain_roles_like(query):
+    q = search.fold(query)
+    return [t["captain_role"] for t in store.get().teams if t.get("captain_role") and q in search.fold(t["captain_role"])]
+
+async def ac_player(interaction, current):
+    if not ac_league(interaction):
+        return []
+    return choices(await worker.run(names_like, current, 25))
+
+async def ac_own_player(interaction, current):
+    if not ac_league(interaction):
+        return []
+    return choices(await worker.run(own_players_like, interaction.user, current))
+
+async def ac_auction(interaction, current):
+    if not ac_league(interaction):
+        return []
+    return choices(await worker.run(auctions_like, current))
+
+async def ac_captain_role(interaction, current):
+    if not ac_league(interaction):
+        return []
+    return choices(await worker.run(captain_roles_like, current))
+
+async def ac_my_offer(interaction, current):
+    if not ac_league(interaction):
+        return []
+    role = roles.captain_role(interaction.user)
+    lst = await worker.run(market.get_private_offers_for, role) if role else []
+    q = search.fold(current)
+    return [app_commands.Choice(name=f"#{o['id']} {o['player_name']} · {o['price']}M ({o['from_role']})"[:100], value=o["id"])
+            for o in lst if q in search.fold(o["player_name"]) or current.strip("#") == o["id"]][:25]
+
+async def ac_on_sale(interaction, current):
+    if not ac_league(interaction):
+        return []
+    q = search.fold(current)
+    rows = (await worker.run(market.list_public_offers, 1, 1000))[0]
+    return [app_commands.Choice(name=f"{o['player_name']} · {o['price']}M ({o['seller']})"[:100], value=o["player_name"][:100])
+            for o in rows if not o.get("locked") and q in search.fold(o["player_name"])][:25]
+
+@bot.tree.command(name="pujar", description="Puja por un jugador en subasta")
+@app_commands.describe(jugador="Jugador en subasta", cantidad="Millones que pujas")
+@app_commands.autocomplete(jugador=ac_auction)
+async def slash_pujar(interaction: discord.Interaction, jugador: str, cantidad: float):
+    await run_slash(interaction, pujar, jugador, cantidad)
+
+@bot.tree.command(name="clausulazo", description="Paga la cláusula de un jugador y fíchalo")
+@app_commands.autocomplete(jugador=ac_player)
+async def slash_clausulazo(interaction: discord.Interaction, jugador: str):
+    await run_slash(interaction, clausulazo, player_name=jugador)
+
+@bot.tree.command(name="ponerventa", description="Pon a la venta un jugador de tu equipo")
+@app_commands.autocomplete(jugador=ac_own_player)
+async def slash_ponerventa(interaction: discord.Interaction, jugador: str, precio: float, locked: bool = False):
+    await run_slash(interaction, ponerventa, args=f"{jugador} {precio} {'yes' if locked else 'no'}")
+
+@bot.tree.command(name="comprar", description="Compra un jugador en venta al precio publicado")
+@app_commands.autocomplete(jugador=ac_on_sale)
+async def slash_comprar(interaction: discord.Interaction, jugador: str):
+    await run_slash(interaction, comprar, player_name=jugador)
+
+@bot.tree.command(name="ofertaprivada", description="Ofrece un jugador a otro equipo")
+@app_commands.describe(equipo="Rol del capitán que recibe la oferta")
+@app_commands.autocomplete(equipo=ac_captain_role, jugador=ac_own_player)
+async def slash_ofertaprivada(interaction: discord.Interaction, equipo: str, jugador: str, precio: float):
+    await run_slash(interaction, ofertaprivada, equipo, jugador, precio)
+
+@bot.tree.command(name="aceptar_privada", description="Acepta una oferta privada")
+@app_commands.autocomplete(oferta=ac_my_offer)
+async def slash_aceptar_privada(interaction: discord.Interaction, oferta: str):
+    await run_slash(interaction, aceptar_privada, player_name=oferta)
+
+@bot.tree.command(name="asignar_valores", description="Asigna valor a hasta 3 jugadores (máx. 60M en total)")
+@app_commands.autocomplete(jugador1=ac_own_player, jugador2=ac_own_player, jugador3=ac_own_player)
+async def slash_asignar_valores(interaction: discord.Interaction, jugador1: str, valor1: float,
+                                jugador2: str = None, valor2: float = None, jugador3: str = None, valor3: float = None):
+    pairs = []
+    for j, v in ((jugador1, valor1), (jugador2, valor2), (jugador3, valor3)):
+        if j and v is not None:
+            pairs += [j, str(v)]
+    await run_slash(interaction, asignar_valores, *pairs)
 
 # -----------------------
 # Run bot
@@ -293,4 +850,5 @@ if __name__ == "__main__":
         print("PON TU TOKEN EN config.json")
     else:
         bot.run(token)
+        worker.shutdown()
 
@@ -0,0 +1,107 @@
+# daily.py
+# selección del mercado diario. Cada jugador tiene un peso (0 = no elegible: capitán, blindado, sin
+# valor o fuera de la banda de valor); los pesos viven en un árbol de Fenwick por posición en la
+# tabla de jugadores, que store.py actualiza al confirmar cada jugador. Sacar n jugadores es
+# n sorteos ponderados sin reemplazo de O(log jugadores) cada uno, sin recorrer la tabla.
+# Lo que depende del día (ya en subasta, salió hace poco, cupos por equipo/curso) se comprueba
+# al sacar cada candidato; el que no vale se aparta hasta el final del sorteo.
+# Reglas en config.json -> "DAILY_RULES".
+
+RULES = {
+    "weight": "uniform",   # "uniform" | "value" (más valor, más probable)
+    "min_value": 0.01,     # banda de valor (M); por debajo / encima no sale
+    "max_value": None,
+    "cooldown_days": 3,    # un jugador no repite hasta pasados estos días
+    "team_quota": 2,       # como mucho por equipo en un mismo día (None = sin límite; los libres no cuentan)
+    "course_quota": None,  # como mucho por curso en un mismo día (los que no tienen curso no cuentan)
+}
+
+def weight(p, rules=None):
+    r = rules or RULES
+    if p.get("captain") or p.get("blinded"):
+        return 0
+    v = float(p.get("value") or 0)
+    if v <= 0 or v < (r["min_value"] or 0) or (r["max_value"] is not None and v > r["max_value"]):
+        return 0
+    # enteros: el árbol suma y resta sin errores de redondeo
+    return max(1, round(v * 100)) if r["weight"] == "value" else 100
+
+class Fenwick:
+    def __init__(self, weights):
+        self.n = len(weights)
+        self.tree = [0] + list(weights)
+        for i in range(1, self.n + 1):
+            j = i + (i & -i)
+            if j <= self.n:
+                self.tree[j] += self.tree[i]
+        self.total = sum(weights)
+
+    def add(self, i, delta):
+        self.total += delta
+        i += 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, x):
+        # posición cuyo tramo acumulado contiene x (0 <= x < total)
+        pos, step = 0, 1 << self.n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and self.tree[nxt] <= x:
+                pos = nxt
+                x -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+class Pool:
+    # índice de elegibles de la tabla de jugadores (misma posición que store.players)
+    def __init__(self, players, rules=None):
+        self.rules = rules or RULES
+        self.w = [weight(p, self.rules) for p in players]
+        self.tree = Fenwick(self.w)
+
+    def update(self, i, p):
+        w = weight(p, self.rules)
+        if w != self.w[i]:
+            self.tree.add(i, w - self.w[i])
+            self.w[i] = w
+
+    def eligible(self):
+        return sum(1 for w in self.w if w)
+
+    def draw(self, n, accept, rnd):
+        # hasta n posiciones distintas, cada una con probabilidad proporcional a su peso entre las
+        # que quedan; accept(i) decide si vale (y apunta cupos). El árbol queda como estaba.
+        picked, out = [], []
+        try:
+            while len(picked) < n and self.tree.total > 0:
+                i = self.tree.find(rnd.randrange(self.tree.total))
+                out.append(i)
+                self.tree.add(i, -self.w[i])
+                if accept(i):
+                    picked.append(i)
+        finally:
+            for i in out:
+                self.tree.add(i, self.w[i])
+        return picked
+
+class Quotas:
+    # cupos de un día: por equipo y por curso. Sin equipo (libre) o sin curso no hay cupo
+    def __init__(self, rules=None):
+        self.rules = rules or RULES
+        self.teams, self.courses = {}, {}
+
+    def fits(self, p):
+        r, team, course = self.rules, p.get("team"), p.get("course")
+        if team and r["team_quota"] is not None and self.teams.get(team, 0) >= r["team_quota"]:
+            return False
+        if course and r["course_quota"] is not None and self.courses.get(course, 0) >= r["course_quota"]:
+            return False
+        return True
+
+    def take(self, p):
+        if p.get("team"):
+            self.teams[p["team"]] = self.teams.get(p["team"], 0) + 1
+        if p.get("course"):
+            self.courses[p["course"]] = self.courses.get(p["course"], 0) + 1
@@ -0,0 +1,164 @@
+# economy.py
+# libro de cuentas de la liga (partida doble): cada movimiento de dinero es una entrada inmutable
+#   {"seq", "ts", "kind", "src", "dst", "amount", "ref"}  -> amount CÉNTIMOS (int) de src a dst
+# La cuenta LIGA es la organización (presupuestos iniciales, compras de jugadores libres), así que
+# la suma de todas las cuentas es siempre 0.
+# El presupuesto sigue en equipos.json ("budget", en M); el Ledger en memoria lleva el saldo de cada
+# equipo en céntimos (se actualiza con cada equipo confirmado) y lo retenido por pujas vivas
+# -> saldo/disponible en O(1). reconcile() comprueba que el libro suma lo mismo que los presupuestos.
+# Las entradas van en la transacción (tx.ledger): json -> journal y luego ledger.jsonl en el
+# checkpoint; sqlite -> tabla ledger en el mismo commit.
+import time
+
+LIGA = "__liga__"
+
+def cents(x):
+    return int(round(float(x or 0) * 100))
+
+def money(c):
+    return round(c / 100, 2)
+
+class Ledger:
+    def __init__(self, seq=0):
+        self.seq = seq        # última entrada confirmada
+        self.balances = {}    # cuenta -> céntimos
+        self.holds = {}       # equipo -> {clave: céntimos}
+        self.held = {}        # equipo -> total retenido
+        self.hold_owner = {}  # clave -> equipo
+        self.unflushed = []   # confirmadas pero aún no escritas en ledger.jsonl (backend json)
+
+    def reset_balances(self, teams):
+        # los saldos son los presupuestos confirmados (tras cargar / reemplazar equipos)
+        self.balances = {t["id"]: cents(t.get("budget")) for t in teams}
+        self.balances[LIGA] = -sum(self.balances.values())
+
+    def balance(self, team_id):
+        return self.balances.get(team_id, 0)
+
+    def held_by(self, team_id, exclude=None):
+        h = self.held.get(team_id, 0)
+        if exclude is not None:
+            h -= self.holds.get(team_id, {}).get(exclude, 0)
+        return h
+
+    def available(self, team_id):
+        return self.balance(team_id) - self.held_by(team_id)
+
+    def hold(self, team_id, key, amount_c):
+        # una retención por clave (p.ej. una por subasta); poner otra la sustituye, sea de quien sea
+        if self.hold_owner.get(key) not in (None, team_id):
+            self.release_key(key)
+        hs = self.holds.setdefault(team_id, {})
+        self.held[team_id] = self.held.get(team_id, 0) - hs.get(key, 0) + amount_c
+        hs[key] = amount_c
+        self.hold_owner[key] = team_id
+
+    def release(self, team_id, key):
+        amt = self.holds.get(team_id, {}).pop(key, 0)
+        if amt:
+            self.held[team_id] -= amt
+        if self.hold_owner.get(key) == team_id:
+            del self.hold_owner[key]
+        return amt
+
+    def release_key(self, key):
+        team_id = self.hold_owner.get(key)
+        return self.release(team_id, key) if team_id is not None else 0
+
+    def set_balance(self, team_id, amount_c):
+        # al confirmar un equipo; la cuenta LIGA compensa para que todo sume 0
+        d = amount_c - self.balances.get(team_id, 0)
+        if d:
+            self.balances[team_id] = amount_c
+            self.balances[LIGA] = self.balances.get(LIGA, 0) - d
+
+    def apply(self, e):
+        self.seq = max(self.seq, e["seq"])
+
+# -----------------------
+# movimientos (dentro de una transacción de store)
+# -----------------------
+def record(tx, kind, src, dst, amount_c, ref=None):
+    # apunta la entrada sin tocar presupuestos (aperturas y ajustes)
+    e = {"seq":tx.st.ledger.seq + len(tx.ledger) + 1, "ts":round(time.time(), 3), "kind":kind,
+         "src":src, "dst":dst, "amount":int(amount_c), "ref":ref}
+    tx.ledger.append(e)
+    return e
+
+def pay(tx, payer, payee, amount, kind, ref=None):
+    # payer/payee: copias de trabajo de equipos (o None = LIGA); el que llama hace put_team
+    c = cents(amount)
+    if payer is not None:
+        payer["budget"] = money(cents(payer.get("budget")) - c)
+    if payee is not None:
+        payee["budget"] = money(cents(payee.get("budget")) + c)
+    return record(tx, kind, payer["id"] if payer else LIGA, payee["id"] if payee else LIGA, c, ref)
+
+def available(st, team, hold_key=None):
+    # presupuesto (de la copia de trabajo) menos lo retenido por otras pujas; las retenciones de
+    # subastas ya resueltas en la transacción en curso (tx.released) no cuentan
+    tx = st.current_tx()
+    skip = tx.released if tx is not None else ()
+    held = st.ledger.held_by(team["id"])
+    for k, a in st.ledger.holds.get(team["id"], {}).items():
+        if k == hold_key or k in skip:
+            held -= a
+    return cents(team.get("budget")) - held
+
+def can_pay(st, team, amount, hold_key=None):
+    return available(st, team, hold_key) >= cents(amount)
+
+def sync_holds(ledger, old, new, team_of_role):
+    # cada subasta retiene su puja máxima al equipo que la lleva; al superarla se le libera.
+    # solo se recalculan las subastas que han cambiado (las demás son el mismo objeto)
+    for name, auc in new.items():
+        if old.get(name) is auc:
+            continue
+        top = auc.get("top")
+        tid = team_of_role(top["captain_role"]) if top else None
+        if tid:
+            ledger.hold(tid, name, cents(top["amount"]))
+        else:
+            ledger.release_key(name)
+    for name in old:
+        if name not in new:
+            ledger.release_key(name)
+
+def summary(st, team_id):
+    # (saldo, retenido, disponible) en M, para !saldo
+    led = st.ledger
+    return money(led.balance(team_id)), money(led.held_by(team_id)), money(led.available(team_id))
+
+def open_accounts(st):
+    # primera vez: una entrada de apertura por equipo con su presupuesto actual
+    with st.transaction() as tx:
+        for t in st.teams:
+            if cents(t.get("budget")):
+                record(tx, "apertura", LIGA, t["id"], cents(t.get("budget")))
+
+# -----------------------
+# conciliación
+# -----------------------
+def reconcile(st):
+    # suma del libro (fichero/tabla + pendientes) vs presupuestos
+    sums, n = {}, 0
+    for e in list(st.backend.iter_ledger()) + list(st.ledger.unflushed):
+        sums[e["src"]] = sums.get(e["src"], 0) - e["amount"]
+        sums[e["dst"]] = sums.get(e["dst"], 0) + e["amount"]
+        n += 1
+    problems = []
+    for t in st.teams:
+        b = cents(t.get("budget"))
+        if sums.get(t["id"], 0) != b:
+            problems.append({"team":t["id"],"budget":b,"ledger":sums.get(t["id"], 0)})
+    return {"entries":n, "total":sum(sums.values()), "problems":problems}
+
+def adjust(st, problems):
+    # el presupuesto manda (p.ej. editado a mano + !recargar): el libro se pone al día con ajustes
+    with st.transaction() as tx:
+        for p in problems:
+            d = p["budget"] - p["ledger"]
+            if d > 0:
+                record(tx, "ajuste", LIGA, p["team"], d)
+            elif d < 0:
+                record(tx, "ajuste", p["team"], LIGA, -d)
@@ -0,0 +1,156 @@
+# integrity.py
+# comprobación del estado de una liga en una pasada con los índices de store.py (O(jugadores +
+# equipos + mercado), milisegundos aunque la liga sea grande):
+#  - plantillas (equipos.json) vs campo team de cada jugador (jugadores.json)
+#  - jugadores en dos plantillas, repetidos en la misma o con el nombre mal escrito
+#  - team guardado con el nombre del equipo en vez de su id (o con un equipo que no existe)
+#  - "dueños" y ofertas públicas que ya no corresponden al dueño real
+#  - subastas de jugadores que no existen o con un vendedor que ya no es el dueño (aviso: al cerrar
+#    se queda sin vender, market.settle_auctions)
+#  - presupuestos negativos y fichajes por encima del límite
+#  - (ledger=True) libro de cuentas vs presupuestos, con economy.reconcile (lee el libro entero)
+# Las plantillas mandan (son lo que mira un traspaso, teams._transfer): el resto se arregla para
+# cuadrar con ellas. Un jugador que no está en ninguna plantilla pero cuyo team es un equipo que
+# existe se añade a esa plantilla; si su team no existe solo se avisa (nunca se le quita el equipo).
+# check() solo informa; repair() aplica los arreglos en UNA transacción.
+# Se lanza al arrancar el bot (bot.py, on_ready) y con !verificar [reparar].
+import time
+import economy, metrics
+from store import norm, copy_rec
+
+MAX_SIGNINGS = 3   # igual que teams._transfer
+WARNINGS = {"vendedor"}   # tipos que no son estado roto, solo avisos
+
+def check(st, ledger=False):
+    # [{"kind", "msg", "fix"}]; fix = None si hay que mirarlo a mano (o es un aviso, WARNINGS)
+    t0 = time.perf_counter()
+    problems = []
+    def add(kind, msg, fix=None):
+        problems.append({"kind":kind, "msg":msg, "fix":fix})
+
+    # equipos por id y, si no choca con ningún id, por nombre
+    team_of = {norm(t["id"]): t["id"] for t in st.teams}
+    for t in st.teams:
+        k = norm(t.get("name"))
+        if not k:
+            continue
+        other = team_of.setdefault(k, t["id"])
+        if other != t["id"]:
+            add("nombre_ambiguo", f"el nombre de {t['id']} ({t['name']}) es también el de {other}")
+
+    # plantillas: una pasada, quitando repetidos y corrigiendo nombres. Los arreglos de plantilla
+    # apuntan a rosters (las plantillas limpias al final de la pasada): repair() reescribe cada
+    # equipo que haya cambiado una sola vez
+    rosters, holders = {}, {}   # id equipo -> plantilla limpia; nombre -> [equipos que lo tienen]
+    for t in st.teams:
+        clean, here = [], set()
+        for name in t.get("players", []):
+            p = st.p_by_name.get(norm(name))
+            if p is None:
+                add("desconocido", f"{t['id']} tiene a {name}, que no está en jugadores")
+                clean.append(name)
+                continue
+            k = norm(p["name"])
+            if k in here:
+                add("repetido", f"{p['name']} está dos veces en {t['id']}", ("team_players", t["id"], rosters))
+                continue
+            if name != p["name"]:
+                add("nombre", f"{t['id']} tiene a {name} en vez de {p['name']}", ("team_players", t["id"], rosters))
+            here.add(k)
+            clean.append(p["name"])
+            holders.setdefault(k, []).append(t["id"])
+        rosters[t["id"]] = clean
+        if t.get("budget", 0) < 0:
+            add("presupuesto", f"presupuesto negativo: {t['id']} {t['budget']}")
+        if t.get("fichajes_hechos", 0) > MAX_SIGNINGS:
+            add("limite", f"más de {MAX_SIGNINGS} fichajes: {t['id']} ({t['fichajes_hechos']})")
+
+    owners = st.market.get("dueños") or {}
+    public = st.market.get("offers") or {}
+    owner_of = {}
+    for p in st.players:
+        k = norm(p["name"])
+        h = holders.get(k, ())
+        claimed = team_of.get(norm(p.get("team"))) if p.get("team") else None
+        owner = h[0] if h else None
+        if not h and p.get("team"):
+            if claimed is None:
+                # equipo desconocido: se deja como está (dueños y ofertas se comparan con él)
+                add("sin_equipo", f"{p['name']}: team={p['team']} no es ningún equipo")
+                owner = p["team"]
+            else:
+                add("plantilla", f"{p['name']} es de {claimed} pero no está en su plantilla", ("team_players", claimed, rosters))
+                rosters[claimed] = rosters[claimed] + [p["name"]]
+                owner = claimed
+        if len(h) > 1:
+            # en varias plantillas: se queda en la que dice el jugador (o en la primera)
+            owner = claimed if claimed in h else h[0]
+            add("duplicado", f"{p['name']} está en {', '.join(h)}: se queda en {owner}", ("team_players", None, rosters))
+            for tid in h:
+                if tid != owner:
+                    rosters[tid] = [n for n in rosters[tid] if norm(n) != k]
+        owner_of[k] = owner
+        if p.get("team") != owner:
+            if claimed is not None and claimed == owner:
+                add("id_equipo", f"{p['name']}: team={p['team']} es el nombre de {owner}, no su id", ("player_team", p["id"], owner))
+            else:
+                add("equipo", f"{p['name']}: team={p.get('team')} pero plantilla={owner}", ("player_team", p["id"], owner))
+        if p["name"] in owners and owners[p["name"]] != owner:
+            add("dueño", f"dueños[{p['name']}]={owners[p['name']]} pero plantilla={owner}", ("owner", p["name"], owner))
+        o = public.get(p["id"])
+        if o is not None and o.get("seller") != owner:
+            add("oferta", f"{p['name']} a la venta por {o.get('seller')}, que no es su dueño ({owner})", ("drop_offer", p["id"]))
+
+    for name, tid in owners.items():
+        if norm(name) not in st.p_by_name:
+            add("dueño", f"dueños[{name}]={tid}: el jugador no existe", ("owner", name, None))
+    for pid in public:
+        if norm(pid) not in st.p_by_id:
+            add("oferta", f"oferta pública de {pid}: el jugador no existe", ("drop_offer", pid))
+    for name, auc in (st.market.get("auctions") or {}).items():
+        k = norm(name)
+        if k not in st.p_by_name:
+            add("subasta", f"subasta de {name}: el jugador no existe")
+        elif auc.get("seller_team") and auc["seller_team"] != owner_of.get(k):
+            add("vendedor", f"subasta de {name}: vende {auc['seller_team']} pero es de {owner_of.get(k)} (quedará sin vender)")
+
+    if ledger:
+        for x in economy.reconcile(st)["problems"]:
+            add("libro", f"{x['team']}: presupuesto {economy.money(x['budget'])}M, libro {economy.money(x['ledger'])}M", ("ledger", x))
+    metrics.observe("integrity_check_ms", (time.perf_counter() - t0) * 1000)
+    return problems
+
+def repair(st, problems):
+    # aplica los arreglos de check(); devuelve cuántos
+    fixes = [x["fix"] for x in problems if x["fix"]]
+    if not fixes:
+        return 0
+    with st.transaction() as tx:
+        books, rosters = [], None
+        for op, *args in fixes:
+            if op == "player_team":
+                pid, tid = args
+                p = copy_rec(tx.players.get(pid) or st.players[st.p_pos[pid]])
+                p["team"] = tid
+                tx.put_player(p)
+            elif op == "team_players":
+                rosters = args[1]
+            elif op == "owner":
+                name, tid = args
+                if tid is None:
+                    tx.del_entry("dueños", name)
+                else:
+                    tx.put_entry("dueños", name, tid)
+            elif op == "drop_offer":
+                tx.del_entry("offers", args[0])
+            elif op == "ledger":
+                books.append(args[0])
+        for tid, names in (rosters or {}).items():
+            t = st.teams[st.t_pos[tid]]
+            if names != t.get("players", []):
+                t = copy_rec(t)
+                t["players"] = list(names)
+                tx.put_team(t)
+        if books:
+            economy.adjust(st, books)
+    return len(fixes)
@@ -0,0 +1,109 @@
+# leagues.py
+# una liga por servidor de discord: cada guild tiene su carpeta (ligas/<guild_id>/), su Store,
+# su hilo escritor, sus locks y sus vencimientos de subastas. Se cargan al primer uso y se
+# descargan tras LEAGUE_IDLE segundos sin comandos (antes se hace checkpoint). Solo los comandos
+# (bot.py: before_invoke, run_slash) cuentan como uso; las tareas de fondo entran sin tocar last_used.
+# con MULTI_LEAGUE = False todos los servidores comparten la liga de siempre (ficheros de BASE)
+import os, time, asyncio, contextvars, weakref
+from concurrent.futures import ThreadPoolExecutor
+import store, roles
+
+BASE = os.path.dirname(__file__)
+LEAGUES_DIR = os.path.join(BASE, "ligas")
+MULTI_LEAGUE = False
+LEGACY_GUILD_ID = None   # este guild sigue usando los ficheros de BASE
+LEAGUE_IDLE = 30*60
+
+class League:
+    def __init__(self, guild_id, base):
+        self.guild_id = guild_id
+        self.base = base
+        self.store = store.STATE if base == BASE else store.Store(base)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"liga-{guild_id}")
+        self.locks = weakref.WeakValueDictionary()
+        self.last_used = time.time()
+        self.active = 0        # llamadas de worker.run en curso
+        self.closed = False    # descargada: su hilo ya no acepta trabajo
+
+_leagues = {}
+_sleeping = {}   # guild_id -> próximo vencimiento de subasta de una liga descargada
+CURRENT = contextvars.ContextVar("league", default=None)
+
+def key_for(guild_id):
+    if not MULTI_LEAGUE or guild_id is None or guild_id == LEGACY_GUILD_ID:
+        return None
+    return guild_id
+
+def base_for(key):
+    if key is None:
+        return BASE
+    base = os.path.join(LEAGUES_DIR, str(key))
+    os.makedirs(base, exist_ok=True)
+    return base
+
+def get(guild_id, touch=False):
+    key = key_for(guild_id)
+    lg = _leagues.get(key)
+    if lg is None:
+        lg = _leagues[key] = League(key, base_for(key))
+        _sleeping.pop(key, None)
+    if touch:
+        lg.last_used = time.time()
+    return lg
+
+def enter(guild_id, touch=False):
+    # activa la liga del guild en el contexto actual (comando / tarea): store.get(),
+    # worker.run y worker.lock pasan a usar la suya. touch=True: cuenta como uso (comandos)
+    lg = get(guild_id, touch)
+    CURRENT.set(lg)
+    store.use(lg.store)
+    return lg
+
+def current():
+    return CURRENT.get()
+
+def peek(guild_id):
+    # la liga del guild solo si ya está cargada (sin crearla ni leer del disco)
+    lg = _leagues.get(key_for(guild_id))
+    return lg if lg is not None and lg.store.loaded else None
+
+def resolve():
+    # la liga activa; si se descargó mientras el comando esperaba, se vuelve a cargar
+    # (la descarga hizo checkpoint, así que la nueva lee lo mismo del disco)
+    lg = current() or get(None)
+    if lg.closed:
+        lg = enter(lg.guild_id)
+    return lg
+
+def loaded():
+    return list(_leagues.values())
+
+def due_sleeping(now):
+    # ligas descargadas con alguna subasta ya vencida (hay que cargarlas para cerrarla)
+    return [k for k, t in _sleeping.items() if t is not None and t <= now]
+
+async def evict_idle(now=None, next_expiry=None):
+    # next_expiry: función que devuelve el próximo vencimiento de la liga activa (market.next_expiry)
+    now = time.time() if now is None else now
+    loop = asyncio.get_running_loop()
+    for key, lg in list(_leagues.items()):
+        if now - lg.last_used < LEAGUE_IDLE or lg.store is store.STATE:
+            continue
+        if lg.active or any(l.locked() for l in lg.locks.values()):
+            continue
+        ctx = contextvars.copy_context()
+        ctx.run(store.use, lg.store)
+        nxt = None
+        if lg.store.loaded:
+            await loop.run_in_executor(lg.executor, lg.store.checkpoint)
+            if next_expiry:
+                nxt = await loop.run_in_executor(lg.executor, lambda: ctx.run(next_expiry))
+        # mientras se guardaba ha podido llegar trabajo: entonces se queda para la próxima.
+        # Sin await desde aquí hasta el final, así que nadie encola nada entre medias
+        if lg.active or lg.last_used > now or any(l.locked() for l in lg.locks.values()):
+            continue
+        lg.closed = True
+        lg.executor.shutdown(wait=False)
+        del _leagues[key]
+        _sleeping[key] = nxt
+        roles.forget_league(key)
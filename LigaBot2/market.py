@@ -1,170 +1,338 @@
 # market.py
-import json, os, random, math
-from teams import load_players, load_teams, find_player_by_name, update_player, update_team, get_team_by_id, transfer_player_by_name, buy_player_free
+import random, math, copy, time, datetime
+import store, auction, scheduler, offers, economy, valuation, daily
+from teams import load_players, find_player_by_name, get_team_by_captain_role, transfer_player_by_name, buy_player_free
 
-BASE = os.path.dirname(__file__)
-MERC_FILE = os.path.join(BASE, "mercado.json")
+# el mercado vive en store.py; cada función es UNA transacción (una línea de journal),
+# y las que hacen fichajes meten el traspaso en la misma transacción
 
 def read():
-    if not os.path.exists(MERC_FILE):
-        with open(MERC_FILE,"w",encoding="utf-8") as f:
-            json.dump({"open":False,"auctions":{},"offers":[],"private_offers":{},"dueños":{}}, f, indent=2, ensure_ascii=False)
-    with open(MERC_FILE,"r",encoding="utf-8") as f:
-        return json.load(f)
+    # solo lectura
+    return store.get().market
 
 def write(data):
-    with open(MERC_FILE,"w",encoding="utf-8") as f:
-        json.dump(data,f, indent=2, ensure_ascii=False)
+    # compat: reemplaza el mercado entero en una transacción
+    with store.get().transaction() as tx:
+        for k, v in data.items():
+            tx.m[k] = copy.deepcopy(v)
 
 def open_market():
-    m = read()
-    m["open"] = True
-    write(m)
+    with store.get().transaction() as tx:
+        tx.m["open"] = True
     return True
 
-def close_market():
-    m = read()
-    m["open"] = False
-    # resolve auctions: highest bid wins
-    results = []
-    for pname, auc in list(m["auctions"].items()):
-        bids = auc.get("bids",[])
-        if not bids:
-            # no bids, return player to seller (nada)
+def close_market(dry_run=False):
+    # cierra el mercado resolviendo TODAS las subastas en memoria y guardando una sola vez.
+    # dry_run=True: calcula el resultado pero descarta la transacción (vista previa)
+    with store.get().transaction() as tx:
+        tx.m["open"] = False
+        results, unsold = settle_auctions(tx)
+        tx.section("auctions").clear()
+        revalue(tx, results, unsold)
+        if dry_run:
+            tx.abort()
+    return (results, unsold) if dry_run else results
+
+def settle_auctions(tx, names=None):
+    # resuelve las subastas indicadas (todas si names es None) dentro de la transacción tx.
+    # si el ganador ya tiene 3 fichajes o no le llega el presupuesto se pasa a la siguiente puja.
+    # los traspasos van a la misma transacción, así que cada equipo ve los fichajes anteriores
+    auctions = store.get().market_section("auctions")
+    results, unsold = [], []
+    for pname in (list(auctions) if names is None else names):
+        auc = auctions.get(pname)
+        if not auc:
             continue
-        # find highest bid
-        bids_sorted = sorted(bids, key=lambda x: x["amount"], reverse=True)
-        winner = bids_sorted[0]
-        buyer_role = winner["captain_role"]
-        amount = winner["amount"]
         seller_team_id = auc["seller_team"]
-        # perform transfer; buyer role maps to team id
-        # need to get buyer team id via teams.json: captain_role -> team.id
-        buyer_team = None
-        for t in load_teams():
-            if t["captain_role"].strip().lower() == buyer_role.strip().lower():
-                buyer_team = t
+        done, why = False, "sin pujas"
+        for bid in auction.candidates(auc):
+            buyer_team = get_team_by_captain_role(bid["captain_role"])
+            if not buyer_team or buyer_team["id"] == seller_team_id:
+                continue
+            if buyer_team.get("fichajes_hechos",0) >= 3:
+                why = "límite de fichajes"
+                continue
+            if not economy.can_pay(store.get(), buyer_team, bid["amount"], pname):
+                why = "sin presupuesto"
+                continue
+            if seller_team_id:
+                res = transfer_player_by_name(pname, seller_team_id, buyer_team["id"], bid["amount"], pname)
+            else:
+                res = buy_player_free(pname, buyer_team["id"], bid["amount"], pname)
+            if res == True:
+                results.append({"player":pname,"buyer":buyer_team["id"],"seller":seller_team_id,"price":bid["amount"]})
+                tx.put_entry("dueños", pname, buyer_team["id"])
+                _drop_offers_for(tx, pname)
+                done = True
                 break
-        if not buyer_team:
-            continue
-        res = transfer_player_by_name(pname, seller_team_id, buyer_team["id"], amount)
-        if res == True:
-            results.append({"player":pname,"buyer":buyer_team["id"],"seller":seller_team_id,"price":amount})
-            # mark dueño
-            m["dueños"][pname] = buyer_team["id"]
-        # if limite or False, skip (no change)
-    # clear auctions
-    m["auctions"] = {}
-    write(m)
-    return results
+            why = {"limite":"límite de fichajes","presupuesto":"sin presupuesto"}.get(res, "traspaso no válido")
+        if not done:
+            unsold.append({"player":pname,"seller":seller_team_id,"reason":why})
+        # resuelta: su retención ya no cuenta para las siguientes
+        tx.released.add(pname)
+    return results, unsold
+
+# -----------------------
+# ofertas públicas (offers.Book): {player_id: oferta} + índices por vendedor y precio
+# -----------------------
+def book():
+    st = store.get()
+    if st.book is None:
+        st.book = offers.build_book(st.market["offers"])
+    return st.book
 
 def post_public_offer(player_id, player_name, seller_team_id, price, locked=False):
-    m = read()
+    if not auction.valid_amount(price): return False
     # prevent selling if blind
     p = find_player_by_name(player_name)
     if not p: return False
     if p.get("blinded"): return False
-    # remove existing public offers for same player
-    m["offers"] = [o for o in m["offers"] if o["player_id"]!=player_id]
-    m["offers"].append({"player_id":player_id,"player_name":player_name,"seller":seller_team_id,"price":float(price),"locked":bool(locked)})
-    write(m)
+    with store.get().transaction() as tx:
+        # una oferta por jugador: la nueva sustituye a la anterior
+        o = {"player_id":player_id,"player_name":player_name,"seller":seller_team_id,"price":float(price),"locked":bool(locked)}
+        tx.put_entry("offers", player_id, o)
+        book().add(o)
     return True
 
 def remove_public_offer(player_name):
-    m = read()
-    m["offers"] = [o for o in m["offers"] if o["player_name"].lower()!=player_name.lower()]
-    write(m)
+    p = find_player_by_name(player_name)
+    if not p:
+        return False
+    with store.get().transaction() as tx:
+        if p["id"] not in store.get().market_section("offers"):
+            return False
+        tx.del_entry("offers", p["id"])
+    return True
+
+def get_public_offer(player_name):
+    p = find_player_by_name(player_name)
+    return read()["offers"].get(p["id"]) if p else None
+
+def list_public_offers(page=1, per_page=15, seller=None, lo=None, hi=None, desc=False):
+    # devuelve (ofertas, total, paginas) ordenadas por precio, igual que utils.hist_page
+    rows = book().browse(read()["offers"], lo, hi, seller, desc)
+    pages = max(1, math.ceil(len(rows) / per_page))
+    page = min(max(1, page), pages)
+    return rows[(page-1)*per_page:page*per_page], len(rows), pages
+
+def buy_public_offer(buyer_role, player_name):
+    # compra directa al precio publicado: traspaso, dueño y ofertas en una transacción
+    with store.get().transaction() as tx:
+        return _buy_public_offer(tx, buyer_role, player_name)
+
+def _buy_public_offer(tx, buyer_role, player_name):
+    p = find_player_by_name(player_name)
+    o = store.get().market_section("offers").get(p["id"]) if p else None
+    if not o:
+        return False, "Ese jugador no está en venta."
+    if o.get("locked"):
+        # en venta con locked=yes: se anuncia, pero solo se vende con una oferta privada al vendedor
+        return False, "Esa venta está bloqueada: el vendedor solo acepta ofertas privadas."
+    if not auction.valid_amount(o["price"]):
+        # precio imposible (datos antiguos / editados a mano): la oferta no vale
+        tx.del_entry("offers", p["id"])
+        return False, "La oferta ya no es válida."
+    buyer_team = get_team_by_captain_role(buyer_role)
+    if not buyer_team:
+        return False, "Equipo comprador no encontrado."
+    if buyer_team["id"] == o["seller"]:
+        return False, "No puedes comprar un jugador de tu equipo."
+    if p.get("team") != o["seller"]:
+        # el jugador ya no es del vendedor: la oferta no vale
+        tx.del_entry("offers", p["id"])
+        return False, "La oferta ya no es válida."
+    if not economy.can_pay(store.get(), buyer_team, o["price"]):
+        return False, "No tienes presupuesto."
+    res = transfer_player_by_name(p["name"], o["seller"], buyer_team["id"], o["price"])
+    if res == True:
+        tx.put_entry("dueños", p["name"], buyer_team["id"])
+        _drop_offers_for(tx, p["name"])
+        return True, {"player":p["name"],"seller":o["seller"],"buyer":buyer_team["id"],"price":o["price"]}
+    elif res == "limite":
+        return False, "Has alcanzado 3 fichajes."
+    elif res == "presupuesto":
+        return False, "No tienes presupuesto."
+    else:
+        return False, "Transferencia fallida."
+
+# -----------------------
+# ofertas privadas (offers.py): {id: oferta} + índices en memoria
+# -----------------------
+def inbox():
+    st = store.get()
+    if st.inbox is None:
+        st.inbox = offers.build(st.market["private_offers"])
+    return st.inbox
+
+def _next_offer_id(tx):
+    seq = int(store.get().market_section("private_seq") or 0) + 1
+    tx.m["private_seq"] = seq
+    return str(seq)
+
+def _find_offer(lst, ref):
+    # ref: id ("12" o "#12") o nombre del jugador (la más reciente)
+    ref = str(ref).strip()
+    oid = ref.lstrip("#")
+    for o in lst:
+        if o["id"] == oid:
+            return o
+    for o in reversed(lst):
+        if offers.norm(o["player_name"]) == offers.norm(ref):
+            return o
+    return None
+
+def _drop_offers_for(tx, player_name):
+    # el jugador ha cambiado de equipo: ninguna oferta sobre él sigue valiendo (ni la pública)
+    for o in inbox().for_player(store.get().market_section("private_offers"), player_name):
+        tx.del_entry("private_offers", o["id"])
+    p = find_player_by_name(player_name)
+    if p and p["id"] in store.get().market_section("offers"):
+        tx.del_entry("offers", p["id"])
 
 def post_private_offer(target_role, player_name, seller_role, price):
-    m = read()
-    lst = m.get("private_offers",{})
-    if target_role not in lst:
-        lst[target_role]=[]
-    lst[target_role].append({"player_name":player_name,"seller_role":seller_role,"price":float(price)})
-    m["private_offers"]=lst
-    write(m)
-    return True
+    # seller_role ofrece player_name a target_role por price; sustituye a la misma oferta repetida.
+    # None si el precio no vale
+    if not auction.valid_amount(price):
+        return None
+    st = store.get()
+    with st.transaction() as tx:
+        for o in inbox().for_target(st.market_section("private_offers"), target_role):
+            if offers.norm(o["player_name"]) == offers.norm(player_name) and offers.norm(o["seller_role"]) == offers.norm(seller_role):
+                tx.del_entry("private_offers", o["id"])
+        oid = _next_offer_id(tx)
+        o = offers.new(oid, player_name, seller_role, target_role, target_role, price)
+        tx.put_entry("private_offers", oid, o)
+        inbox().add(o)
+    return oid
 
 def get_private_offers_for(role_name):
-    return read().get("private_offers",{}).get(role_name,[])
-
-def accept_private_offer(target_role, player_name):
-    m = read()
-    offers = m.get("private_offers",{}).get(target_role,[])
-    chosen=None
-    for o in offers:
-        if o["player_name"].strip().lower() == player_name.strip().lower():
-            chosen=o
-            break
+    # ofertas pendientes de respuesta de role_name
+    return inbox().for_target(read()["private_offers"], role_name)
+
+def get_private_offers_on(role_name):
+    # ofertas (y contraofertas) sobre jugadores de role_name
+    return inbox().for_seller(read()["private_offers"], role_name)
+
+def find_private_offer(target_role, ref):
+    return _find_offer(get_private_offers_for(target_role), ref)
+
+def withdraw_private_offer(role_name, ref):
+    st = store.get()
+    with st.transaction() as tx:
+        live = st.market_section("private_offers")
+        o = live.get(str(ref).strip().lstrip("#"))
+        if not o or offers.norm(o["from_role"]) != offers.norm(role_name):
+            return False, "No has enviado esa oferta."
+        tx.del_entry("private_offers", o["id"])
+    return True, o
+
+def counter_private_offer(target_role, ref, price):
+    # responde a una oferta con otro precio: la original se borra y le toca contestar al otro
+    if not auction.valid_amount(price):
+        return False, "Precio no válido."
+    st = store.get()
+    with st.transaction() as tx:
+        o = _find_offer(inbox().for_target(st.market_section("private_offers"), target_role), ref)
+        if not o:
+            return False, "No tienes esa oferta."
+        tx.del_entry("private_offers", o["id"])
+        oid = _next_offer_id(tx)
+        c = offers.new(oid, o["player_name"], o["seller_role"], o["buyer_role"], o["from_role"], price, counter_of=o["id"])
+        tx.put_entry("private_offers", oid, c)
+        inbox().add(c)
+    return True, c
+
+def accept_private_offer(target_role, ref):
+    with store.get().transaction() as tx:
+        return _accept_private_offer(tx, target_role, ref)
+
+def _accept_private_offer(tx, target_role, ref):
+    chosen = _find_offer(inbox().for_target(store.get().market_section("private_offers"), target_role), ref)
     if not chosen:
         return False, "No tienes esa oferta."
-    # perform transfer between seller_role -> target_role teams
-    seller_role = chosen["seller_role"]
+    player_name = chosen["player_name"]
     price = chosen["price"]
     # map roles to team ids
-    seller_team=None
-    buyer_team=None
-    for t in load_teams():
-        if t["captain_role"].strip().lower() == seller_role.strip().lower():
-            seller_team=t
-        if t["captain_role"].strip().lower() == target_role.strip().lower():
-            buyer_team=t
+    seller_team = get_team_by_captain_role(chosen["seller_role"])
+    buyer_team = get_team_by_captain_role(chosen["buyer_role"])
     if not seller_team or not buyer_team:
         return False, "Equipos no encontrados."
     # transfer
     ok = transfer_player_by_name(player_name, seller_team["id"], buyer_team["id"], price)
     if ok == True:
-        # remove the offer
-        m["private_offers"][target_role] = [o for o in offers if o["player_name"].lower()!=player_name.lower()]
-        write(m)
-        m = read()
-        m["dueños"][player_name] = buyer_team["id"]
-        write(m)
+        # fuera todas las ofertas sobre el jugador + dueño, en la misma transacción que el traspaso
+        _drop_offers_for(tx, player_name)
+        tx.put_entry("dueños", player_name, buyer_team["id"])
         return True, {"player":player_name,"seller":seller_team["id"],"buyer":buyer_team["id"],"price":price}
     elif ok == "limite":
         return False, "El comprador tiene ya 3 fichajes."
+    elif ok == "presupuesto":
+        return False, "El comprador no tiene presupuesto."
     else:
         return False, "Transferencia fallida."
 
+def next_offer_expiry():
+    return inbox().next(store.get().market["private_offers"])
+
+def sweep_private_offers(now=None):
+    # borra (en una transacción) las ofertas caducadas; devuelve cuántas
+    now = time.time() if now is None else now
+    st = store.get()
+    with st.transaction() as tx:
+        try:
+            due = inbox().pop_due(st.market_section("private_offers"), now)
+            for oid in due:
+                tx.del_entry("private_offers", oid)
+        except Exception:
+            st.inbox = None
+            raise
+    return len(due)
+
 def place_auction(player_name, seller_team_id, start_price):
-    m = read()
     # do not add if blind or captain
     p = find_player_by_name(player_name)
     if not p: return False
     if p.get("blinded"): return False
-    auctions = m.get("auctions",{})
-    auctions[player_name] = {"seller_team":seller_team_id,"start_price":float(start_price),"bids":[]}
-    m["auctions"]=auctions
-    write(m)
+    with store.get().transaction() as tx:
+        auc = auction.new(seller_team_id, start_price)
+        tx.put_entry("auctions", player_name, auc)
+        expiries().push(player_name, auc["ends_at"])
     return True
 
 def pujar(player_name, captain_role, amount):
-    m = read()
-    auc = m.get("auctions",{}).get(player_name)
+    with store.get().transaction() as tx:
+        return _pujar(tx, player_name, captain_role, amount)
+
+def _pujar(tx, player_name, captain_role, amount):
+    auc = store.get().market_section("auctions").get(player_name)
     if not auc:
         return False, "No hay subasta para ese jugador."
     # prevent bidding by seller
     seller = auc["seller_team"]
     # map captain_role to team id quickly
-    buyer_team = None
-    for t in load_teams():
-        if t["captain_role"].strip().lower() == captain_role.strip().lower():
-            buyer_team=t
-            break
+    buyer_team = get_team_by_captain_role(captain_role)
     if not buyer_team:
         return False, "Tu equipo no encontrado."
     if buyer_team["id"] == seller:
         return False, "No puedes pujar contra tu propio jugador."
-    # add bid
-    bids = auc.get("bids",[])
-    bids.append({"captain_role":captain_role,"amount":float(amount)})
-    auc["bids"]=bids
-    m["auctions"][player_name]=auc
-    write(m)
-    return True, "Puja registrada."
+    # add bid: mínimo, incremento y presupuesto los valida el motor de subastas.
+    # presupuesto = disponible: lo que ya retienen sus otras pujas máximas no cuenta (O(1))
+    budget = economy.money(economy.available(store.get(), buyer_team, player_name))
+    err = auction.check_bid(auc, amount, budget=budget)
+    if err:
+        return False, err
+    auc = tx.entry("auctions", player_name)
+    ends_at = auc.get("ends_at")
+    ok, msg = auction.place_bid(auc, captain_role, amount, budget=budget)
+    if ok and auc.get("ends_at") != ends_at:
+        expiries().push(player_name, auc["ends_at"])   # anti-sniping: nuevo vencimiento
+    return ok, msg
 
 def pay_clause_and_transfer(player_name, buyer_role):
-    m = read()
+    with store.get().transaction() as tx:
+        return _pay_clause(tx, player_name, buyer_role)
+
+def _pay_clause(tx, player_name, buyer_role):
     p = find_player_by_name(player_name)
     if not p:
         return False, "Jugador no existe."
@@ -172,54 +340,178 @@ def pay_clause_and_transfer(player_name, buyer_role):
     if clause<=0:
         return False, "Jugador no tiene cláusula."
     # owner team
-    owner_team_id = m.get("dueños",{}).get(player_name)
+    owner_team_id = store.get().market_section("dueños").get(player_name)
     if not owner_team_id:
         return False, "Jugador no tiene dueño claro (uso compra normal)."
     # get buyer team
-    buyer_team=None
-    for t in load_teams():
-        if t["captain_role"].strip().lower() == buyer_role.strip().lower():
-            buyer_team=t
-            break
+    buyer_team = get_team_by_captain_role(buyer_role)
     if not buyer_team:
         return False, "Equipo comprador no encontrado."
-    # check budget
-    if buyer_team.get("budget",0) < clause:
+    # check budget (menos lo retenido por pujas vivas)
+    if not economy.can_pay(store.get(), buyer_team, clause):
         return False, "No tienes presupuesto para pagar la cláusula."
     # transfer (ignores auctions/offers)
     res = transfer_player_by_name(player_name, owner_team_id, buyer_team["id"], clause)
     if res == True:
         # update dueños
-        m["dueños"][player_name]=buyer_team["id"]
-        write(m)
+        tx.put_entry("dueños", player_name, buyer_team["id"])
+        _drop_offers_for(tx, player_name)
         return True, {"player":player_name,"buyer":buyer_team["id"],"seller":owner_team_id,"price":clause}
     elif res == "limite":
         return False, "Has alcanzado 3 fichajes."
     else:
         return False, "Transferencia fallida."
 
-def daily_add_random(n=10):
-    # add n random players (not blind, not captain) to auctions with start price = their value (must be >0)
-    players = load_players()
-    pool = [p for p in players if not p.get("blinded") and not p.get("captain")]
-    random.shuffle(pool)
-    selected = []
-    for p in pool:
-        if len(selected)>=n:
-            break
-        if p.get("value",0) and p.get("value",0)>0:
-            selected.append(p)
-    if not selected:
-        return []
-    m = read()
-    for p in selected:
-        # choose seller as current owner team if any (if owned by team list in equipos.json)
-        seller_team_id = p.get("team")
-        # if seller_team_id missing, treat as free and set seller_team_id None
-        start_price = p.get("value")
-        # place auction
-        auctions = m.get("auctions",{})
-        auctions[p["name"]] = {"seller_team":seller_team_id,"start_price":float(start_price),"bids":[]}
-        m["auctions"]=auctions
-    write(m)
+def pool():
+    st = store.get()
+    if st.pool is None:
+        st.pool = daily.Pool(st.players)
+    return st.pool
+
+def daily_add_random(n=10, rnd=random, today=None):
+    # n jugadores elegibles (daily.py) a subasta con precio de salida = su valor. No pisa subastas
+    # abiertas ni repite a los que salieron en los últimos cooldown_days; cupos por equipo/curso.
+    # today: "AAAA-MM-DD" en la zona horaria de la liga (bot.py la pasa; por defecto la del host)
+    st = store.get()
+    auctions, seen = st.market["auctions"], st.market["daily_seen"]
+    today = today or time.strftime("%Y-%m-%d")
+    cutoff = (datetime.date.fromisoformat(today) - datetime.timedelta(days=daily.RULES["cooldown_days"])).isoformat()
+    quotas = daily.Quotas()
+
+    def accept(i):
+        p = st.players[i]
+        if p["name"] in auctions or seen.get(p["name"], "") > cutoff or not quotas.fits(p):
+            return False
+        quotas.take(p)
+        return True
+
+    with st.transaction() as tx:
+        selected = [st.players[i] for i in pool().draw(n, accept, rnd)]
+        for p in selected:
+            # vendedor: el equipo dueño si lo tiene (None = libre)
+            auc = auction.new(p.get("team"), p.get("value"))
+            tx.put_entry("auctions", p["name"], auc)
+            tx.put_entry("daily_seen", p["name"], today)
+            expiries().push(p["name"], auc["ends_at"])
+        for name, day in list(seen.items()):
+            if day <= cutoff:
+                tx.del_entry("daily_seen", name)
+        # para no repetir el mercado diario si el bot se reinicia el mismo día
+        tx.m["last_daily"] = today
     return [p["name"] for p in selected]
+
+def expiries():
+    st = store.get()
+    if st.expiries is None:
+        st.expiries = scheduler.build(st.market["auctions"])
+    return st.expiries
+
+def next_expiry():
+    return expiries().next(store.get().market["auctions"])
+
+def settle_expired(now=None):
+    # resuelve (en una transacción) las subastas cuyo ends_at ya ha pasado
+    now = time.time() if now is None else now
+    st = store.get()
+    with st.transaction() as tx:
+        try:
+            names = expiries().pop_due(st.market_section("auctions"), now)
+            if not names:
+                return [], []
+            results, unsold = settle_auctions(tx, names)
+            for name in names:
+                tx.del_entry("auctions", name)
+            revalue(tx, results, unsold)
+        except Exception:
+            st.expiries = None   # se reconstruye desde el estado confirmado
+            raise
+    return results, unsold
+
+# -----------------------
+# valoración (valuation.py)
+# -----------------------
+def _put_values(tx, changes):
+    for pid, value, clause in changes:
+        p = store.get().player_by_id(pid)
+        p["value"], p["clause"] = value, clause
+        tx.put_player(p)
+    return changes
+
+def revalue(tx, results, unsold=()):
+    # tras un cierre, en la misma transacción: solo los jugadores de ese cierre
+    if not valuation.AUTO or not (results or unsold):
+        return []
+    return _put_values(tx, valuation.update(load_players(), results, unsold))
+
+def revalue_all(history=None):
+    # todos desde el historial (!revalorar); una transacción
+    st = store.get()
+    history = st.backend.iter_history() if history is None else history
+    with st.transaction() as tx:
+        return _put_values(tx, valuation.rebuild(load_players(), history))
+
+# -----------------------
+# auditoría: qué le ha pasado a un jugador en el mercado (deltas de storage.iter_audit)
+# -----------------------
+def _describe(section, old, new):
+    if section == "auctions":
+        if new is None:
+            return "subasta cerrada"
+        if old is None:
+            return f"sale a subasta por {new['start_price']}M"
+        t = new.get("top")
+        if t and t != old.get("top"):
+            return f"puja de {t['captain_role']}: {t['amount']}M"
+        return None
+    if section == "offers":
+        return f"en venta por {new['price']}M ({new['seller']})" if new else "retirado de la venta"
+    if section == "dueños":
+        return f"dueño: {new}" if new else None
+    return None
+
+def audit_trail(player_name, limit=20):
+    # [(ts, texto)] de lo más antiguo a lo más nuevo (las últimas limit)
+    st = store.get()
+    p = find_player_by_name(player_name)
+    if not p:
+        return []
+    keys = {"auctions": p["name"], "offers": p["id"], "dueños": p["name"]}
+    last, privs, out = {}, {}, []
+    for rec in st.backend.iter_audit():
+        ts = rec.get("ts", 0)
+        market = rec.get("market", {})
+        delta = rec.get("delta", {})
+        for section, key in keys.items():
+            if section in market:
+                new = (market[section] or {}).get(key)
+            elif section in delta and key in delta[section]["set"]:
+                new = delta[section]["set"][key]
+            elif section in delta and key in delta[section]["del"]:
+                new = None
+            else:
+                continue
+            old = last.get(section)
+            if new != old:
+                text = _describe(section, old, new)
+                if text:
+                    out.append((ts, text))
+                last[section] = new
+        # ofertas privadas: la clave es el id, se siguen las de este jugador
+        po = market.get("private_offers")
+        changes = dict(po) if po is not None else dict(delta.get("private_offers", {}).get("set", {}))
+        gone = set(privs) - set(po) if po is not None else set(delta.get("private_offers", {}).get("del", []))
+        for oid, o in changes.items():
+            if offers.norm(o.get("player_name")) == offers.norm(p["name"]) and oid not in privs:
+                privs[oid] = o
+                out.append((ts, f"oferta privada #{oid} de {o['from_role']} a {o['target_role']}: {o['price']}M"))
+        for oid in gone & set(privs):
+            privs.pop(oid)
+            out.append((ts, f"oferta privada #{oid} cerrada"))
+        for q in rec.get("players", {}).values():
+            if q["id"] == p["id"]:
+                # el equipo ya sale por "dueños"; del registro solo el valor
+                prev = last.get("player")
+                if prev and prev.get("value") != q.get("value"):
+                    out.append((ts, f"valor {q.get('value')}M (cláusula {q.get('clause')}M)"))
+                last["player"] = q
+    return out[-limit:]
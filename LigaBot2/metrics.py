@@ -0,0 +1,141 @@
+# metrics.py
+# contadores e histogramas en memoria para ver dónde se va el tiempo:
+#  - comandos (! y /): latencia por comando            -> bot.py (before/after_invoke, run_slash)
+#  - worker.run: espera en la cola del hilo de la liga y duración por función (market.pujar...)
+#  - locks de worker: tiempo esperando el lock          -> worker.py
+#  - ficheros: lecturas/escrituras, bytes y tiempo      -> storage.py
+#  - discord: envíos de la cola de notify.py
+# Se consultan con !stats o en formato texto de Prometheus (render()): fichero METRICS_FILE
+# y/o http://127.0.0.1:METRICS_PORT/metrics (serve()).
+import asyncio, bisect, os, threading, time
+
+PREFIX = "ligabot_"
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)   # ms
+
+class Histogram:
+    __slots__ = ("counts", "total", "n")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # el último es +Inf
+        self.total, self.n = 0.0, 0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.total += ms
+        self.n += 1
+
+    def quantile(self, q):
+        # límite superior del bucket donde cae el percentil q (aproximado, como en Prometheus)
+        if not self.n:
+            return 0.0
+        want, acc = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= want:
+                return float(BUCKETS[i]) if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Registry:
+    def __init__(self):
+        # los hilos de las ligas (worker.py) también apuntan aquí
+        self.lock = threading.Lock()
+        self.hists = {}      # (nombre, labels) -> Histogram
+        self.counters = {}   # (nombre, labels) -> número
+        self.started = time.time()
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, ms, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            h = self.hists.get(k)
+            if h is None:
+                h = self.hists[k] = Histogram()
+            h.observe(ms)
+
+    def inc(self, name, n=1, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            self.counters[k] = self.counters.get(k, 0) + n
+
+    def histograms(self, name):
+        # [(labels, Histogram)] de un histograma
+        with self.lock:
+            return [(dict(l), h) for (n, l), h in self.hists.items() if n == name]
+
+    def totals(self, name):
+        with self.lock:
+            return [(dict(l), v) for (n, l), v in self.counters.items() if n == name]
+
+    def reset(self):
+        with self.lock:
+            self.hists.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def render(self):
+        # formato de texto de Prometheus
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+        with self.lock:
+            hists = sorted(self.hists.items())
+            counters = sorted(self.counters.items())
+        out, seen = [], set()
+        for (name, labels), v in counters:
+            if name not in seen:
+                out.append(f"# TYPE {PREFIX}{name} counter")
+                seen.add(name)
+            out.append(f"{PREFIX}{name}{fmt(labels)} {v}")
+        for (name, labels), h in hists:
+            if name not in seen:
+                out.append(f"# TYPE {PREFIX}{name} histogram")
+                seen.add(name)
+            acc = 0
+            for i, c in enumerate(h.counts):
+                acc += c
+                le = str(BUCKETS[i]) if i < len(BUCKETS) else "+Inf"
+                out.append(f"{PREFIX}{name}_bucket{fmt(labels, [('le', le)])} {acc}")
+            out.append(f"{PREFIX}{name}_sum{fmt(labels)} {round(h.total, 3)}")
+            out.append(f"{PREFIX}{name}_count{fmt(labels)} {h.n}")
+        out.append(f"{PREFIX}uptime_seconds {round(time.time() - self.started)}")
+        return "\n".join(out) + "\n"
+
+def esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REG = Registry()
+observe, inc, render = REG.observe, REG.inc, REG.render
+
+def file_io(op, path, nbytes, t0):
+    # una lectura/escritura de fichero (storage.py): cuenta, bytes y tiempo
+    name = path.replace("\\", "/").rsplit("/", 1)[-1]
+    REG.inc("file_ops_total", op=op, file=name)
+    REG.inc("file_bytes_total", nbytes, op=op, file=name)
+    REG.observe("file_io_ms", (time.perf_counter() - t0) * 1000, op=op, file=name)
+
+def dump(path):
+    # volcado para el textfile collector de node_exporter (tmp + rename)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+async def serve(port, host="127.0.0.1"):
+    # endpoint local mínimo: cualquier GET devuelve render()
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render().encode("utf-8")
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,155 @@
+# notify.py
+# cola de envíos en segundo plano (DMs y anuncios en canales): el comando solo encola y responde.
+#  - los mensajes pendientes para el mismo destino se juntan en uno (hasta MAX_LEN caracteres);
+#    los que llevan embeds (announce.py) van solos
+#  - ritmo máximo RATE envíos cada PER segundos (cubo de fichas) para no chocar con los límites de discord
+#  - reintentos con espera exponencial; si el usuario tiene los DMs cerrados no se reintenta
+#  - el estado de cada entrega queda en status (las últimas KEEP)
+import asyncio, itertools, time
+from collections import OrderedDict
+import discord
+import metrics, roles
+
+MAX_LEN = 2000
+KEEP = 500
+
+class Delivery:
+    __slots__ = ("id", "target", "content", "embeds", "attempts", "status", "error", "created", "sent_at")
+
+    def __init__(self, id, target, content, embeds=None):
+        self.id, self.target, self.content, self.embeds = id, target, content, embeds
+        self.attempts = 0
+        self.status = "pendiente"   # pendiente | enviado | reintentando | fallido | bloqueado
+        self.error = None
+        self.created = time.time()
+        self.sent_at = None
+
+class Notifier:
+    def __init__(self, rate=5, per=1.0, retries=4, backoff=2.0):
+        self.rate, self.per = rate, per
+        self.retries, self.backoff = retries, backoff
+        self.pending = {}    # id del destino -> (destino, [Delivery])
+        self.ready = None    # asyncio.Queue de destinos con algo pendiente
+        self.status = OrderedDict()
+        self.ids = itertools.count(1)
+        self.tokens, self.stamp = rate, time.monotonic()
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.ready = self.ready or asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    # -------- encolar --------
+    def send(self, target, content=None, embeds=None):
+        if target is None or not (content or embeds):
+            return None
+        d = Delivery(next(self.ids), target, content, embeds)
+        self.status[d.id] = d
+        while len(self.status) > KEEP:
+            self.status.popitem(last=False)
+        self._push(target, [d])
+        return d
+
+    def send_pages(self, target, messages):
+        # mensajes de announce.embeds(): uno por página, en orden
+        return [self.send(target, embeds=m) for m in messages]
+
+    def dm_role(self, guild, role_name, content):
+        # un DM por miembro con el rol (índice de roles.py, no se recorre guild.members)
+        return [self.send(m, content) for m in roles.members_with(guild, role_name)]
+
+    def _push(self, target, ds):
+        if self.ready is None:
+            self.ready = asyncio.Queue()
+        k = target.id   # los ids de discord (snowflakes) no se repiten entre usuarios y canales
+        if k in self.pending:
+            self.pending[k][1].extend(ds)
+        else:
+            self.pending[k] = (target, list(ds))
+            self.ready.put_nowait(k)
+
+    # -------- envío --------
+    async def _take(self):
+        # cubo de fichas: como mucho rate envíos por ventana de per segundos
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate / self.per)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+    @staticmethod
+    def batches(ds):
+        # junta mensajes consecutivos mientras quepan en MAX_LEN
+        batch, size = [], 0
+        for d in ds:
+            if d.embeds:
+                if batch:
+                    yield batch
+                yield [d]
+                batch, size = [], 0
+                continue
+            n = len(d.content) + (1 if batch else 0)
+            if batch and size + n > MAX_LEN:
+                yield batch
+                batch, size = [], 0
+                n = len(d.content)
+            batch.append(d)
+            size += n
+        if batch:
+            yield batch
+
+    async def run(self):
+        while True:
+            k = await self.ready.get()
+            target, ds = self.pending.pop(k, (None, []))
+            try:
+                for batch in self.batches(ds):
+                    await self._take()
+                    await self._deliver(target, batch)
+            finally:
+                self.ready.task_done()
+
+    async def _deliver(self, target, batch):
+        for d in batch:
+            d.attempts += 1
+        t0 = time.perf_counter()
+        try:
+            if batch[0].embeds:
+                await target.send(batch[0].content, embeds=batch[0].embeds)
+            else:
+                await target.send("\n".join(d.content for d in batch)[:MAX_LEN])
+        except discord.Forbidden as e:
+            # DMs cerrados / sin permiso en el canal: reintentar no sirve
+            metrics.inc("discord_send_errors_total", error="forbidden")
+            for d in batch:
+                d.status, d.error = "bloqueado", str(e)
+            return
+        except Exception as e:
+            metrics.inc("discord_send_errors_total", error=type(e).__name__)
+            retry = [d for d in batch if d.attempts <= self.retries]
+            for d in batch:
+                d.status, d.error = ("reintentando" if d in retry else "fallido"), str(e)
+            if retry:
+                delay = getattr(e, "retry_after", None) or self.backoff ** retry[0].attempts
+                asyncio.get_running_loop().call_later(delay, self._push, target, retry)
+            return
+        metrics.observe("discord_send_ms", (time.perf_counter() - t0) * 1000)
+        now = time.time()
+        for d in batch:
+            d.status, d.error, d.sent_at = "enviado", None, now
+
+    async def drain(self):
+        # espera a que no quede nada en cola (salvo reintentos programados)
+        if self.ready is not None:
+            await self.ready.join()
+
+    def summary(self):
+        counts = {}
+        for d in self.status.values():
+            counts[d.status] = counts.get(d.status, 0) + 1
+        return counts
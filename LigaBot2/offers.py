@@ -0,0 +1,140 @@
+# offers.py
+# ofertas privadas: mercado["private_offers"] es {id: oferta}; cada oferta lleva quién vende,
+# quién compra y a quién le toca responder ("target_role"). Las contraofertas son ofertas nuevas
+# con el target cambiado. Índices en memoria por destinatario, jugador y remitente + heap de
+# caducidades; igual que en scheduler.py las entradas viejas no se borran de los índices, se
+# descartan al leerlas si la oferta ya no existe.
+# Ofertas públicas (Book): mercado["offers"] es {player_id: oferta}, una por jugador, con índice
+# por vendedor y lista ordenada por precio para !ofertas y !comprar.
+import bisect, heapq, time
+
+TTL = 72*3600   # segundos que dura una oferta (0 = no caducan)
+
+def norm(s):
+    return (s or "").strip().lower()
+
+def new(oid, player_name, seller_role, buyer_role, target_role, price, now=None, counter_of=None):
+    now = time.time() if now is None else now
+    return {"id":oid,"player_name":player_name,"seller_role":seller_role,"buyer_role":buyer_role,
+            "target_role":target_role,"from_role":seller_role if target_role == buyer_role else buyer_role,
+            "price":float(price),"created":round(now),"expires_at":round(now + TTL) if TTL else None,
+            "counter_of":counter_of}
+
+def expired(o, now=None):
+    now = time.time() if now is None else now
+    return bool(o.get("expires_at")) and now >= o["expires_at"]
+
+def normalize(m):
+    # formato antiguo: {rol_destino: [{"player_name","seller_role","price"}, ...]} sin ids
+    po = m.get("private_offers") or {}
+    if any(isinstance(v, list) for v in po.values()):
+        out, seq = {}, int(m.get("private_seq", 0))
+        for target, lst in po.items():
+            for o in lst:
+                seq += 1
+                oid = str(seq)
+                out[oid] = dict(new(oid, o["player_name"], o["seller_role"], target, target, o["price"]), expires_at=None)
+        m["private_offers"], m["private_seq"] = out, seq
+    m.setdefault("private_seq", 0)
+    # ofertas públicas: antes una lista
+    if isinstance(m.get("offers"), list):
+        m["offers"] = {o["player_id"]: o for o in m["offers"]}
+    return m
+
+class Inbox:
+    def __init__(self):
+        self.by_target, self.by_player, self.by_seller = {}, {}, {}
+        self.heap = []
+
+    def add(self, o):
+        oid = o["id"]
+        self.by_target.setdefault(norm(o["target_role"]), set()).add(oid)
+        self.by_player.setdefault(norm(o["player_name"]), set()).add(oid)
+        self.by_seller.setdefault(norm(o["seller_role"]), set()).add(oid)
+        if o.get("expires_at"):
+            heapq.heappush(self.heap, (o["expires_at"], oid))
+
+    def _live(self, index, key, offers, now):
+        ids = index.get(norm(key))
+        if not ids:
+            return []
+        out = []
+        for oid in list(ids):
+            o = offers.get(oid)
+            if o is None:
+                ids.discard(oid)   # ya aceptada / retirada / caducada
+            elif not expired(o, now):
+                out.append(o)
+        return sorted(out, key=lambda o: int(o["id"]))
+
+    def for_target(self, offers, role, now=None):
+        return self._live(self.by_target, role, offers, now)
+
+    def for_player(self, offers, name, now=None):
+        return self._live(self.by_player, name, offers, now)
+
+    def for_seller(self, offers, role, now=None):
+        return self._live(self.by_seller, role, offers, now)
+
+    def next(self, offers):
+        while self.heap and self.heap[0][1] not in offers:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, offers, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, oid = heapq.heappop(self.heap)
+            if oid in offers:
+                due.append(oid)
+        return due
+
+def build(offers):
+    inbox = Inbox()
+    for o in offers.values():
+        inbox.add(o)
+    return inbox
+
+class Book:
+    # ofertas públicas: la clave ya es el jugador; aquí vendedor y precio
+    def __init__(self):
+        self.by_seller = {}
+        self.by_price = []   # [(precio, player_id)] ordenada
+
+    def add(self, o):
+        self.by_seller.setdefault(norm(o["seller"]), set()).add(o["player_id"])
+        bisect.insort(self.by_price, (o["price"], o["player_id"]))
+
+    def _compact(self, book):
+        # demasiadas entradas viejas (vendidas / retiradas / cambiadas de precio): se rehace
+        if len(self.by_price) > 2 * len(book) + 64:
+            self.by_price = sorted((o["price"], pid) for pid, o in book.items())
+            for ids in self.by_seller.values():
+                ids.intersection_update(book)
+
+    def browse(self, book, lo=None, hi=None, seller=None, desc=False):
+        # ofertas vivas ordenadas por precio (y jugador), con precio entre lo y hi
+        self._compact(book)
+        if seller is not None:
+            ids = self.by_seller.get(norm(seller), set())
+            ids.intersection_update(book)
+            rows = sorted((book[pid]["price"], pid) for pid in ids if norm(book[pid]["seller"]) == norm(seller))
+            rows = [r for r in rows if (lo is None or r[0] >= lo) and (hi is None or r[0] <= hi)]
+        else:
+            a = 0 if lo is None else bisect.bisect_left(self.by_price, (lo,))
+            b = len(self.by_price) if hi is None else bisect.bisect_right(self.by_price, (hi, "\uffff"))
+            rows = self.by_price[a:b]
+        out, seen = [], set()
+        for price, pid in (reversed(rows) if desc else rows):
+            o = book.get(pid)
+            if o is None or o["price"] != price or pid in seen:
+                continue
+            seen.add(pid)
+            out.append(o)
+        return out
+
+def build_book(book):
+    b = Book()
+    for o in book.values():
+        b.add(o)
+    return b
@@ -0,0 +1,84 @@
+# roles.py
+# miembro de discord -> rol de capitán -> equipo, con caché por (guild, miembro).
+# El rol se recalcula solo cuando cambian los roles del miembro (on_member_update) o un rol
+# del servidor (rename/delete); el equipo cuando cambian los roles de capitán de la liga
+# (store.roles_version) -> cada comando hace una búsqueda en un dict en vez de recorrer roles.
+import store
+
+CAPTAIN_PREFIX = "Capitán de "
+
+_roles = {}   # (guild_id, member_id) -> nombre del rol de capitán (o None)
+_teams = {}   # (guild_id, member_id) -> (store, roles_version, team_id)
+_members = {} # guild_id -> {nombre de rol: set(member_id)} (para los DMs a un rol)
+
+def _key(member):
+    g = getattr(member, "guild", None)
+    return (g.id if g else None, member.id)
+
+def captain_role(member):
+    k = _key(member)
+    try:
+        return _roles[k]
+    except KeyError:
+        pass
+    role = None
+    for r in member.roles:
+        if r.name.startswith(CAPTAIN_PREFIX):
+            role = r.name
+            break
+    _roles[k] = role
+    return role
+
+def team_id(member):
+    # id del equipo del capitán en la liga activa (None si no es capitán o no hay equipo)
+    k = _key(member)
+    st = store.get()
+    hit = _teams.get(k)
+    if hit and hit[0] is st and hit[1] == st.roles_version:
+        return hit[2]
+    role = captain_role(member)
+    t = st.t_by_role.get(store.norm(role)) if role else None
+    tid = t["id"] if t else None
+    _teams[k] = (st, st.roles_version, tid)
+    return tid
+
+def team(member):
+    tid = team_id(member)
+    return store.get().team_by_id(tid) if tid else None
+
+def members_with(guild, role_name):
+    # miembros con ese rol; el índice se hace una vez por servidor y luego se mantiene con invalidate
+    idx = _members.get(guild.id)
+    if idx is None:
+        idx = _members[guild.id] = {}
+        for m in guild.members:
+            for r in m.roles:
+                idx.setdefault(r.name, set()).add(m.id)
+    return [m for m in map(guild.get_member, idx.get(role_name, ())) if m is not None]
+
+def forget_league(guild_id):
+    # liga descargada (leagues.evict_idle): sin referencias a su Store
+    for k in [k for k in _teams if k[0] == guild_id]:
+        del _teams[k]
+
+def invalidate(member=None, guild_id=None, removed=False):
+    # un miembro (cambio de roles / entra / sale), todo un servidor o (sin argumentos) todo
+    if member is not None:
+        k = _key(member)
+        _roles.pop(k, None)
+        _teams.pop(k, None)
+        idx = _members.get(k[0])
+        if idx is not None:
+            for ids in idx.values():
+                ids.discard(member.id)
+            if not removed:
+                for r in member.roles:
+                    idx.setdefault(r.name, set()).add(member.id)
+        return
+    for d in (_roles, _teams):
+        for k in [k for k in d if guild_id is None or k[0] == guild_id]:
+            del d[k]
+    if guild_id is None:
+        _members.clear()
+    else:
+        _members.pop(guild_id, None)
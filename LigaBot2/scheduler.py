@@ -0,0 +1,35 @@
+# scheduler.py
+# vencimientos de subastas: heap de (ends_at, jugador) -> la próxima en O(1), sacar en O(log n).
+# las entradas viejas (subasta cerrada o alargada por anti-sniping) no se buscan para borrarlas:
+# se descartan al llegar arriba del heap si ya no coinciden con la subasta
+import heapq
+
+class Expiries:
+    def __init__(self, heap=None):
+        self.heap = heap or []
+        heapq.heapify(self.heap)
+
+    def push(self, name, ends_at):
+        if ends_at:
+            heapq.heappush(self.heap, (ends_at, name))
+
+    def _valid(self, auctions, ends_at, name):
+        auc = auctions.get(name)
+        return auc is not None and auc.get("ends_at") == ends_at
+
+    def next(self, auctions):
+        while self.heap and not self._valid(auctions, *self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, auctions, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            ends_at, name = heapq.heappop(self.heap)
+            if self._valid(auctions, ends_at, name):
+                due.append(name)
+        return due
+
+def build(auctions):
+    # una vez al cargar: los ends_at están guardados en mercado.json, sobreviven a reinicios
+    return Expiries([(a["ends_at"], n) for n, a in auctions.items() if a.get("ends_at")])
@@ -0,0 +1,79 @@
+# search.py
+# búsqueda de jugadores sin acentos y con errores: "monica lopez", "mon lop" o "mónica lópes"
+# encuentran a "Mónica López". El índice se hace una vez (store.py lo rehace si cambian los nombres):
+#  - exact: nombre plegado -> posición
+#  - prefix: prefijo de cada palabra -> posiciones (para escribir a medias / autocompletar)
+#  - grams: trigramas -> posiciones (para las faltas de ortografía), puntuación de Dice
+import unicodedata, re
+
+MIN_SCORE = 0.3   # por debajo no se sugiere
+
+def fold(s):
+    # minúsculas, sin acentos ni signos: "Mónica  López!" -> "monica lopez"
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(c for c in s if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"[a-z0-9ñ]+", s))
+
+def trigrams(s):
+    s = f"  {s} "
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+class Index:
+    def __init__(self, names):
+        self.names = list(names)
+        self.folded = [fold(n) for n in self.names]
+        self.exact, self.prefix, self.grams, self.ngrams = {}, {}, {}, []
+        for i, f in enumerate(self.folded):
+            self.exact.setdefault(f, i)
+            for tok in f.split():
+                for k in range(1, len(tok) + 1):
+                    self.prefix.setdefault(tok[:k], set()).add(i)
+            g = trigrams(f)
+            self.ngrams.append(len(g))
+            for t in g:
+                self.grams.setdefault(t, set()).add(i)
+
+    def prefix_matches(self, q):
+        # posiciones donde cada palabra de la búsqueda es el principio de alguna palabra del nombre
+        hits = None
+        for tok in q.split():
+            s = self.prefix.get(tok, set())
+            hits = set(s) if hits is None else hits & s
+            if not hits:
+                return set()
+        return hits or set()
+
+    def search(self, query, limit=5):
+        # [(nombre, puntuación)] de mejor a peor
+        q = fold(query)
+        if not q:
+            return [(n, 0.0) for n in self.names[:limit]]
+        qg = trigrams(q)
+        common = {}
+        for t in qg:
+            for i in self.grams.get(t, ()):
+                common[i] = common.get(i, 0) + 1
+        pre = self.prefix_matches(q)
+        scores = {}
+        for i in set(common) | pre:
+            s = 2 * common.get(i, 0) / (len(qg) + self.ngrams[i])
+            if i in pre:
+                s += 0.5
+            if self.folded[i] == q:
+                s += 1.0
+            if s >= MIN_SCORE:
+                scores[i] = s
+        best = sorted(scores, key=lambda i: (-scores[i], self.names[i]))[:limit]
+        return [(self.names[i], round(scores[i], 3)) for i in best]
+
+    def resolve(self, query, limit=5):
+        # (nombre, sugerencias): nombre solo si no hay duda -> igual sin acentos, o
+        # un único nombre que encaja palabra a palabra ("mon lop"); si no, None + sugerencias
+        q = fold(query)
+        i = self.exact.get(q)
+        if i is not None:
+            return self.names[i], []
+        pre = self.prefix_matches(q) if q else set()
+        if len(pre) == 1:
+            return self.names[next(iter(pre))], []
+        return None, [n for n, _ in self.search(query, limit)]
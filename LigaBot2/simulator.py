@@ -0,0 +1,234 @@
+# simulator.py
+# simulador / generador de carga sin servidor de discord: guild, miembros, roles y canales falsos
+# que guardan lo que se les envía, y un driver que lanza miles de !pujar, !ofertaprivada,
+# !clausulazo... concurrentes contra los handlers REALES de bot.py. Al final comprueba el estado
+# (presupuestos negativos, jugadores duplicados o en dos plantillas...).
+#   python simulator.py --guilds 2 --ops 5000 --concurrency 200
+#   python simulator.py --record carga.jsonl      (guarda la carga generada)
+#   python simulator.py --replay carga.jsonl      (la vuelve a lanzar)
+import argparse, asyncio, json, os, random, shutil, sys, tempfile, time
+import bench, leagues, auction, integrity
+
+# -----------------------
+# objetos falsos
+# -----------------------
+class FakeRole:
+    def __init__(self, id, name):
+        self.id, self.name = id, name
+        self.members = []
+
+class FakeChannel:
+    def __init__(self, id, name, guild=None):
+        self.id, self.name, self.guild = id, name, guild
+        self.sent = []
+
+    async def send(self, content=None, **kw):
+        self.sent.append(content if content is not None else kw)
+
+class FakeMember:
+    def __init__(self, id, name, roles, guild=None):
+        self.id, self.name, self.display_name = id, name, name
+        self.roles = roles
+        self.guild = guild
+        self.dms = []
+        self.mention = f"<@{id}>"
+
+    async def send(self, content=None, **kw):
+        self.dms.append(content if content is not None else kw)
+
+class FakeGuild:
+    def __init__(self, id, name):
+        self.id, self.name = id, name
+        self.members, self.roles, self.text_channels = [], [], []
+        self._by_id = {}
+
+    def add_member(self, m):
+        self.members.append(m)
+        self._by_id[m.id] = m
+
+    def get_member(self, mid):
+        return self._by_id.get(mid)
+
+    def get_role(self, rid):
+        return next((r for r in self.roles if r.id == rid), None)
+
+class FakeContext:
+    def __init__(self, guild, author, channel, command=None):
+        self.guild, self.author, self.channel, self.command = guild, author, channel, command
+        self.message = None
+        self.replies = []   # solo las de este comando (el canal lo comparten todos)
+
+    async def send(self, content=None, **kw):
+        self.replies.append(content)
+        await self.channel.send(content, **kw)
+        return content
+
+# -----------------------
+# montaje
+# -----------------------
+def build_guild(gid, base, tms, fich_channel, admin_role):
+    g = FakeGuild(gid, f"Liga {gid}")
+    general = FakeChannel(gid * 10 + 1, "general", g)
+    fich = FakeChannel(gid * 10 + 2, fich_channel, g)
+    g.text_channels = [general, fich]
+    admin = FakeRole(gid * 1000, admin_role)
+    g.roles.append(admin)
+    for i, t in enumerate(tms):
+        r = FakeRole(gid * 1000 + i + 1, t["captain_role"])
+        g.roles.append(r)
+        m = FakeMember(gid * 1000 + i + 1, t["captain_role"].replace("Capitán de ", "Cap "), [r], g)
+        r.members.append(m)
+        g.add_member(m)
+    m = FakeMember(gid * 1000, "Admin", [admin], g)
+    admin.members.append(m)
+    g.add_member(m)
+    return g
+
+class Simulator:
+    def __init__(self, bot_module, base, n_guilds=1, teams=12, per_team=12, auctions=40, bids=5, seed=1):
+        self.b = bot_module
+        self.base = base
+        self.rnd = random.Random(seed)
+        self.guilds = {}
+        self.players = {}
+        leagues.MULTI_LEAGUE = True
+        leagues.LEAGUES_DIR = base
+        for k in range(n_guilds):
+            gid = 100 + k     # las cargas grabadas dependen de estos ids
+            gbase = os.path.join(base, str(gid))
+            players, tms = bench.generate_league(gbase, teams, per_team, auctions, bids, 0, seed + k)
+            # dueños conocidos para que haya clausulazos posibles
+            with open(os.path.join(gbase, "mercado.json"), encoding="utf-8") as f:
+                m = json.load(f)
+            m["dueños"] = {p["name"]: p["team"] for p in players}
+            with open(os.path.join(gbase, "mercado.json"), "w", encoding="utf-8") as f:
+                json.dump(m, f, ensure_ascii=False)
+            self.guilds[gid] = build_guild(gid, gbase, tms, self.b.FICH_CHANNEL, self.b.ADMIN_ROLE)
+            self.players[gid] = players
+        # bot.get_guild / announce_channel tienen que encontrar los guilds falsos
+        self.b.bot.get_guild = lambda gid: self.guilds.get(gid)
+        self.lat = {}
+        self.outcomes = {}
+        self.errors = []
+        self.offers_sent = {}   # guild -> [(rol destino, jugador)] de las ofertas generadas
+
+    def captains(self, gid):
+        return [m for m in self.guilds[gid].members if self.b.get_captain_role_of_user(m)]
+
+    # genera una invocación aleatoria (comando, args, kwargs) sobre el estado actual
+    def random_op(self, gid):
+        rnd = self.rnd
+        lg = leagues.get(gid)
+        auctions = lg.store.market["auctions"] if lg.store.loaded else {}
+        caps = self.captains(gid)
+        author = rnd.choice(caps)
+        kind = rnd.choices(["pujar", "ofertaprivada", "aceptar_privada", "clausulazo"], [70, 15, 10, 5])[0]
+        p = rnd.choice([p for p in self.players[gid] if not p["captain"]])
+        if kind == "pujar" and auctions:
+            name = rnd.choice(list(auctions))
+            amount = round(auction.min_bid(auctions[name]) + rnd.choice([0, 0, 0.5, 2, -1]), 2)
+            return {"guild":gid, "author":author.id, "command":"pujar", "args":[name, amount]}
+        sent = self.offers_sent.setdefault(gid, [])
+        if kind == "ofertaprivada":
+            target = rnd.choice([c for c in caps if c is not author])
+            role = self.b.get_captain_role_of_user(target)
+            sent.append((role, p["name"]))
+            return {"guild":gid, "author":author.id, "command":"ofertaprivada",
+                    "args":[role, p["name"], float(rnd.randint(1, 30))]}
+        if kind == "aceptar_privada" and sent:
+            # el destinatario de una oferta ya generada (puede llegar antes que la oferta: se rechaza)
+            role, name = rnd.choice(sent)
+            author = next(c for c in caps if self.b.get_captain_role_of_user(c) == role)
+            return {"guild":gid, "author":author.id, "command":"aceptar_privada", "kwargs":{"player_name":name}}
+        return {"guild":gid, "author":author.id, "command":"clausulazo", "kwargs":{"player_name":p["name"]}}
+
+    async def invoke(self, op):
+        g = self.guilds[op["guild"]]
+        author = g.get_member(op["author"])
+        cmd = self.b.bot.get_command(op["command"])
+        ctx = FakeContext(g, author, g.text_channels[0], cmd)
+        t0 = time.perf_counter()
+        try:
+            await self.b.enter_league(ctx)
+            await cmd.callback(ctx, *op.get("args", []), **op.get("kwargs", {}))
+        except Exception as e:
+            self.errors.append((op, repr(e)))
+        self.lat.setdefault(op["command"], []).append((time.perf_counter() - t0) * 1000)
+        reply = next((s for s in ctx.replies if isinstance(s, str)), "")
+        key = (op["command"], "ok" if reply.startswith("✅") else "rechazado")
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    async def run(self, ops, concurrency=100):
+        sem = asyncio.Semaphore(concurrency)
+        async def one(op):
+            async with sem:
+                await self.invoke(op)
+        t0 = time.perf_counter()
+        await asyncio.gather(*[one(op) for op in ops])
+        return time.perf_counter() - t0
+
+    def check(self):
+        # invariantes de cada liga (integrity.py, sin los avisos) y el libro de cuentas
+        problems = []
+        for gid in self.guilds:
+            st = leagues.get(gid).store.ensure()
+            problems += [f"[{gid}] {p['msg']}" for p in integrity.check(st, ledger=True) if p["kind"] not in integrity.WARNINGS]
+        return problems
+
+def percentile(xs, q):
+    return bench.percentile(xs, q)
+
+async def main(args):
+    import bot as bot_module
+    tmp = tempfile.mkdtemp(prefix="ligasim-")
+    try:
+        ops = None
+        if args.replay:
+            with open(args.replay, encoding="utf-8") as f:
+                ops = [json.loads(l) for l in f if l.strip()]
+            args.guilds = max(op["guild"] for op in ops) - 99
+        sim = Simulator(bot_module, tmp, args.guilds, args.teams, args.players, args.auctions, args.bids, args.seed)
+        for gid in sim.guilds:
+            leagues.enter(gid)
+            leagues.get(gid).store.ensure()
+        if ops is None:
+            ops = [sim.random_op(sim.rnd.choice(list(sim.guilds))) for _ in range(args.ops)]
+        if args.record:
+            with open(args.record, "w", encoding="utf-8") as f:
+                for op in ops:
+                    f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        # la cola de DMs/anuncios sin el límite de discord: aquí solo se mide el bot
+        bot_module.notifier.rate = args.send_rate
+        bot_module.notifier.start()
+        elapsed = await sim.run(ops, args.concurrency)
+        await bot_module.notifier.drain()
+        print(f"{len(ops)} comandos en {elapsed:.2f}s -> {len(ops)/elapsed:.0f} comandos/s (concurrencia {args.concurrency})")
+        for cmd, xs in sorted(sim.lat.items()):
+            ok = sim.outcomes.get((cmd, "ok"), 0)
+            print(f"  {cmd:>16}: n={len(xs):>6} ok={ok:>6}  p50={percentile(xs,.5):8.2f}ms  p95={percentile(xs,.95):8.2f}ms  p99={percentile(xs,.99):8.2f}ms  max={max(xs):8.2f}ms")
+        dms = sum(len(m.dms) for g in sim.guilds.values() for m in g.members)
+        print(f"  DMs enviados: {dms}; mensajes en canales: {sum(len(c.sent) for g in sim.guilds.values() for c in g.text_channels)}; entregas: {bot_module.notifier.summary()}")
+        for op, err in sim.errors[:10]:
+            print(f"  ERROR {op}: {err}")
+        problems = sim.check()
+        print("Estado consistente." if not problems else "INCONSISTENCIAS:\n  " + "\n  ".join(problems[:50]))
+        return 1 if problems or sim.errors else 0
+    finally:
+        for lg in leagues.loaded():
+            lg.executor.shutdown(wait=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Simulador de carga de comandos de la liga")
+    ap.add_argument("--guilds", type=int, default=1)
+    ap.add_argument("--teams", type=int, default=12)
+    ap.add_argument("--players", type=int, default=12, help="jugadores por equipo")
+    ap.add_argument("--auctions", type=int, default=40)
+    ap.add_argument("--bids", type=int, default=5, help="pujas iniciales por subasta")
+    ap.add_argument("--ops", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--send-rate", type=int, default=1000, help="envíos por segundo de la cola de DMs")
+    ap.add_argument("--record", help="guarda la carga generada (jsonl)")
+    ap.add_argument("--replay", help="lanza una carga guardada (jsonl)")
+    sys.exit(asyncio.run(main(ap.parse_args())))
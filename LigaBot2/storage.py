@@ -0,0 +1,580 @@
+# storage.py
+# backends de persistencia del estado de la liga (store.py tiene el estado en memoria).
+# todos tienen el mismo interfaz:
+#   load() -> (players, teams, market, journal pendiente)
+#   commit(rec, st)          guarda una transacción (st = estado ANTES de aplicarla) -> bytes
+#   checkpoint(st, dirty)    vuelca lo pendiente (solo si journaled) -> bytes de la foto
+#   iter_audit()             todas las transacciones confirmadas (auditoría, si AUDIT)
+#   append_history(entries), history_page(...), iter_history(start)
+#   append_ledger(entries), iter_ledger(), ledger_last_seq()   (libro de cuentas, economy.py)
+#  - "json": los json de siempre + journal.jsonl + historial.jsonl + ledger.jsonl + auditoria.jsonl
+#  - "sqlite": liga.db en modo WAL con tablas indexadas (importar con: python storage.py importar)
+import json, os, sqlite3, threading, bisect, sys, time
+import metrics
+
+AUDIT = True   # guardar las transacciones (deltas) para auditoría (config.json -> MARKET_AUDIT)
+
+def norm(s):
+    return (s or "").strip().lower()
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    # utf-8-sig: algunos json se han editado a mano y llevan BOM
+    t0 = time.perf_counter()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f)
+        metrics.file_io("read", path, os.fstat(f.fileno()).st_size, t0)
+    return data
+
+def write_json_atomic(path, data, indent=2):
+    # tmp + fsync + rename: o queda el fichero viejo o el nuevo, nunca uno a medias
+    t0 = time.perf_counter()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False, separators=None if indent else (",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+        n = os.fstat(f.fileno()).st_size
+    os.replace(tmp, path)
+    metrics.file_io("write", path, n, t0)
+    return n
+
+def drop_partial_tail(path):
+    # un append cortado por un crash deja la última línea a medias: se quita, para que no rompa
+    # la lectura ni el siguiente append se pegue a ella. Una última línea válida a la que solo le
+    # falta el "\n" (editada a mano) se conserva y se le pone. Solo se abre para escribir si hay
+    # que arreglar algo. Devuelve el tamaño final
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        tail, start = b"", size
+        # hacia atrás hasta el "\n" que cierra la penúltima línea
+        while start and tail.rfind(b"\n", 0, len(tail) - 1) < 0:
+            start = max(0, start - 4096)
+            f.seek(start)
+            tail = f.read(size - start)
+    cut = tail.rfind(b"\n", 0, len(tail) - 1)
+    line_start = start + cut + 1 if cut >= 0 else start
+    last = tail[line_start - start:]
+    if not last.strip():
+        return size
+    try:
+        json.loads(last)
+    except ValueError:
+        with open(path, "rb+") as f:
+            f.truncate(line_start)
+        return line_start
+    if last.endswith(b"\n"):
+        return size
+    with open(path, "ab") as f:
+        f.write(b"\n")
+    return size + 1
+
+def dumps(v):
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+
+def open_backend(base, kind="json"):
+    if kind == "sqlite":
+        return SqliteBackend(os.path.join(base, "liga.db"))
+    return JsonBackend(base)
+
+# -----------------------
+# JSON + journal
+# -----------------------
+class JsonHistory:
+    # historial append-only: una línea JSON por fichaje.
+    # el índice (offset de cada línea + fecha/equipos/jugador) se construye una vez y se
+    # mantiene al añadir, así una página de !history solo lee sus líneas del disco
+    def __init__(self, base):
+        self.old_file = os.path.join(base, "historial.json")   # formato antiguo, solo para migrar
+        self.file = os.path.join(base, "historial.jsonl")
+        self.lock = threading.RLock()
+        self.idx = None
+
+    def _migrate(self):
+        if os.path.exists(self.file) or not os.path.exists(self.old_file):
+            return
+        data = read_json(self.old_file, []) or []
+        with open(self.file, "w", encoding="utf-8") as f:
+            for e in data:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _index_entry(idx, off, e):
+        n = len(idx["offsets"])
+        idx["offsets"].append(off)
+        idx["dates"].append(e.get("date",""))
+        for k in ("buyer","seller"):
+            if e.get(k):
+                lst = idx["by_team"].setdefault(norm(e[k]), [])
+                if not lst or lst[-1] != n:   # buyer==seller no duplica
+                    lst.append(n)
+        idx["by_player"].setdefault(norm(e.get("player")), []).append(n)
+
+    def index(self):
+        with self.lock:
+            self._migrate()
+            size = os.path.getsize(self.file) if os.path.exists(self.file) else 0
+            if self.idx is not None and self.idx["size"] == size:
+                return self.idx
+            # solo al (re)construir el índice: se arregla una última línea cortada
+            size = drop_partial_tail(self.file)
+            # primera vez (o el fichero cambió por fuera): un solo scan
+            idx = {"offsets":[], "dates":[], "by_team":{}, "by_player":{}, "size":0}
+            if size:
+                t0 = time.perf_counter()
+                with open(self.file, "rb") as f:
+                    off = 0
+                    for line in f:
+                        if line.strip():
+                            try:
+                                self._index_entry(idx, off, json.loads(line))
+                            except ValueError:
+                                pass  # línea ilegible: no entra en el índice
+                        off += len(line)
+                metrics.file_io("read", self.file, off, t0)
+            idx["size"] = size
+            self.idx = idx
+            return idx
+
+    def append(self, entries):
+        # todo el lote en un solo append
+        with self.lock:
+            idx = self.index()
+            lines = [(e, (json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8")) for e in entries]
+            t0 = time.perf_counter()
+            data = b"".join(l for _, l in lines)
+            with open(self.file, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            metrics.file_io("write", self.file, len(data), t0)
+            off = idx["size"]
+            for e, l in lines:
+                self._index_entry(idx, off, e)
+                off += len(l)
+            idx["size"] = off
+
+    def iter(self, start=0):
+        # generador: no carga el historial entero en memoria
+        with self.lock:
+            idx = self.index()
+            if start >= len(idx["offsets"]):
+                return
+            off = idx["offsets"][start]
+        t0, n = time.perf_counter(), 0
+        try:
+            with open(self.file, "rb") as f:
+                f.seek(off)
+                for line in f:
+                    n += len(line)
+                    if line.strip():
+                        try:
+                            e = json.loads(line)
+                        except ValueError:
+                            continue
+                        yield e
+        finally:
+            metrics.file_io("read", self.file, n, t0)
+
+    def page(self, page, per_page, team=None, player=None, desde=None, hasta=None):
+        with self.lock:
+            idx = self.index()
+            n = len(idx["offsets"])
+            lo = bisect.bisect_left(idx["dates"], desde) if desde else 0
+            hi = bisect.bisect_right(idx["dates"], hasta + " 99") if hasta else n
+            cand = None
+            if team:
+                cand = idx["by_team"].get(norm(team), [])
+            if player:
+                pl = idx["by_player"].get(norm(player), [])
+                cand = pl if cand is None else sorted(set(cand) & set(pl))
+            if cand is None:
+                total = max(0, hi - lo)
+                sel = lambda a, b: range(hi - 1 - a, hi - 1 - b, -1)
+            else:
+                cand = cand[bisect.bisect_left(cand, lo):bisect.bisect_left(cand, hi)]
+                total = len(cand)
+                sel = lambda a, b: [cand[-1 - i] for i in range(a, b)]
+            pages = max(1, -(-total // per_page))
+            page = min(max(1, page), pages)
+            a = (page - 1) * per_page
+            b = min(total, a + per_page)
+            offsets = [idx["offsets"][i] for i in sel(a, b)]
+        out, t0, n = [], time.perf_counter(), 0
+        with open(self.file, "rb") as f:
+            for off in offsets:
+                f.seek(off)
+                line = f.readline()
+                n += len(line)
+                out.append(json.loads(line))
+        metrics.file_io("read", self.file, n, t0)
+        return out, total, pages
+
+class JsonBackend:
+    journaled = True
+
+    def __init__(self, base):
+        self.jug_file = os.path.join(base, "jugadores.json")
+        self.teams_file = os.path.join(base, "equipos.json")
+        self.merc_file = os.path.join(base, "mercado.json")
+        self.journal_file = os.path.join(base, "journal.jsonl")
+        self.ledger_file = os.path.join(base, "ledger.jsonl")
+        self.audit_file = os.path.join(base, "auditoria.jsonl")
+        self.journal_bytes = 0
+        self.history = JsonHistory(base)
+
+    def load(self):
+        players = read_json(self.jug_file, []) or []
+        teams = read_json(self.teams_file, []) or []
+        market = read_json(self.merc_file, None)
+        # lo que quedó en el journal desde el último checkpoint
+        recs = []
+        if os.path.exists(self.journal_file):
+            t0 = time.perf_counter()
+            # última línea cortada por un crash: esa transacción no llegó a confirmarse. Se quita del
+            # fichero, si no el siguiente commit se pegaría a ella y se perdería también
+            drop_partial_tail(self.journal_file)
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        recs.append(json.loads(line))
+                    except ValueError:
+                        break
+            self.journal_bytes = os.path.getsize(self.journal_file)
+            metrics.file_io("read", self.journal_file, self.journal_bytes, t0)
+        return players, teams, market, recs
+
+    def commit(self, rec, st):
+        t0 = time.perf_counter()
+        line = (dumps(rec) + "\n").encode("utf-8")
+        with open(self.journal_file, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.file_io("write", self.journal_file, len(line), t0)
+        return len(line)
+
+    def checkpoint(self, st, dirty):
+        # la foto es lo que se reescribe; mercado.json compacto (es el que más crece)
+        n = 0
+        if "players" in dirty:
+            n += write_json_atomic(self.jug_file, st.players)
+        if "teams" in dirty:
+            n += write_json_atomic(self.teams_file, st.teams)
+        if "market" in dirty:
+            n += write_json_atomic(self.merc_file, st.market, indent=None)
+        # los json ya contienen todo: el journal pasa a la auditoría y se vacía.
+        # si se corta entre las dos cosas, la auditoría tendrá ese trozo repetido (mismo "ts")
+        if AUDIT and os.path.exists(self.journal_file) and os.path.getsize(self.journal_file):
+            t0 = time.perf_counter()
+            with open(self.journal_file, "rb") as src, open(self.audit_file, "ab") as dst:
+                data = src.read()
+                dst.write(data)
+            metrics.file_io("write", self.audit_file, len(data), t0)
+        open(self.journal_file, "w").close()
+        self.journal_bytes = 0
+        return n
+
+    def iter_audit(self):
+        # auditoría + lo que aún está en el journal, en orden
+        for path in (self.audit_file, self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        break
+
+    def append_history(self, entries):
+        self.history.append(entries)
+
+    def iter_history(self, start=0):
+        return self.history.iter(start)
+
+    def history_page(self, page, per_page, **filt):
+        return self.history.page(page, per_page, **filt)
+
+    def append_ledger(self, entries):
+        t0 = time.perf_counter()
+        data = "".join(dumps(e) + "\n" for e in entries).encode("utf-8")
+        with open(self.ledger_file, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.file_io("write", self.ledger_file, len(data), t0)
+
+    def iter_ledger(self):
+        if not os.path.exists(self.ledger_file):
+            return
+        with open(self.ledger_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        break  # igual que el journal: lo que sigue no llegó a escribirse entero
+
+    def ledger_last_seq(self):
+        # solo la última línea: se lee el final del fichero (antes se quita la que quedase a medias).
+        # solo se llama al cargar la liga (Store.load)
+        if not drop_partial_tail(self.ledger_file):
+            return 0
+        with open(self.ledger_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            lines = [l for l in f.read().splitlines() if l.strip()]
+        for l in reversed(lines):
+            try:
+                return json.loads(l)["seq"]
+            except ValueError:
+                continue
+        return 0
+
+# -----------------------
+# SQLite (WAL)
+# -----------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (id TEXT PRIMARY KEY, pos INTEGER, name_norm TEXT, team TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS players_name ON players(name_norm);
+CREATE INDEX IF NOT EXISTS players_team ON players(team);
+CREATE TABLE IF NOT EXISTS teams (id TEXT PRIMARY KEY, pos INTEGER, role_norm TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS teams_role ON teams(role_norm);
+-- secciones del mercado que son dict (auctions, dueños, private_offers...): una fila por entrada
+CREATE TABLE IF NOT EXISTS market_map (section TEXT, key TEXT, value TEXT NOT NULL, PRIMARY KEY(section, key));
+-- el resto (open, offers, last_daily...): una fila por sección
+CREATE TABLE IF NOT EXISTS market_kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS history (seq INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, player TEXT, buyer TEXT, seller TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS history_date ON history(date);
+CREATE INDEX IF NOT EXISTS history_player ON history(player, seq);
+CREATE INDEX IF NOT EXISTS history_buyer ON history(buyer, seq);
+CREATE INDEX IF NOT EXISTS history_seller ON history(seller, seq);
+CREATE TABLE IF NOT EXISTS ledger (seq INTEGER PRIMARY KEY, ts REAL, kind TEXT, src TEXT, dst TEXT, amount INTEGER NOT NULL, ref TEXT);
+CREATE INDEX IF NOT EXISTS ledger_src ON ledger(src, seq);
+CREATE INDEX IF NOT EXISTS ledger_dst ON ledger(dst, seq);
+CREATE TABLE IF NOT EXISTS audit (seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, data TEXT NOT NULL);
+"""
+
+UPSERT_PLAYER = "INSERT OR REPLACE INTO players(id, pos, name_norm, team, data) VALUES (?,?,?,?,?)"
+UPSERT_TEAM = "INSERT OR REPLACE INTO teams(id, pos, role_norm, data) VALUES (?,?,?,?)"
+UPSERT_MAP = "INSERT OR REPLACE INTO market_map(section, key, value) VALUES (?,?,?)"
+DELETE_MAP = "DELETE FROM market_map WHERE section=? AND key=?"
+UPSERT_KV = "INSERT OR REPLACE INTO market_kv(key, value) VALUES (?,?)"
+DELETE_KV = "DELETE FROM market_kv WHERE key=?"
+INSERT_HIST = "INSERT INTO history(date, player, buyer, seller, data) VALUES (?,?,?,?,?)"
+INSERT_AUDIT = "INSERT INTO audit(ts, data) VALUES (?,?)"
+INSERT_LEDGER = "INSERT OR IGNORE INTO ledger(seq, ts, kind, src, dst, amount, ref) VALUES (?,?,?,?,?,?,?)"
+LEDGER_COLS = ("seq", "ts", "kind", "src", "dst", "amount", "ref")
+
+class SqliteBackend:
+    journaled = False
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self.legacy = set()   # secciones que eran lista en market_kv y ya son dict (p.ej. offers)
+
+    def load(self):
+        q = self.db.execute
+        players = [json.loads(d) for (d,) in q("SELECT data FROM players ORDER BY pos")]
+        teams = [json.loads(d) for (d,) in q("SELECT data FROM teams ORDER BY pos")]
+        market = {}
+        for section, key, value in q("SELECT section, key, value FROM market_map"):
+            market.setdefault(section, {})[key] = json.loads(value)
+        for key, value in q("SELECT key, value FROM market_kv"):
+            market[key] = json.loads(value)
+            if isinstance(market[key], list):
+                self.legacy.add(key)
+        return players, teams, market or None, []
+
+    def _player_row(self, p, pos):
+        return (p["id"], pos, norm(p["name"]), p.get("team"), dumps(p))
+
+    def _team_row(self, t, pos):
+        return (t["id"], pos, norm(t.get("captain_role")), dumps(t))
+
+    def _market_rows(self, key, new, old):
+        # solo las entradas que cambian (por identidad y luego por valor)
+        up, rm = [], []
+        if isinstance(new, dict):
+            old = old if isinstance(old, dict) else {}
+            for k, v in new.items():
+                o = old.get(k)
+                if v is not o and v != o:
+                    up.append((key, k, dumps(v)))
+            rm = [(key, k) for k in old if k not in new]
+        return up, rm
+
+    def commit(self, rec, st):
+        with self.lock:
+            t0 = time.perf_counter()
+            c = self.db
+            c.execute("BEGIN")
+            try:
+                prows = [self._player_row(p, st.p_pos[p["id"]]) for p in rec["players"].values()]
+                trows = [self._team_row(t, st.t_pos[t["id"]]) for t in rec["teams"].values()]
+                c.executemany(UPSERT_PLAYER, prows)
+                c.executemany(UPSERT_TEAM, trows)
+                n = sum(len(r[-1]) for r in prows) + sum(len(r[-1]) for r in trows)
+                for key, v in rec["market"].items():
+                    if isinstance(v, dict):
+                        # sección que era lista: la primera vez se escribe entera y sale de market_kv
+                        up, rm = self._market_rows(key, v, None if key in self.legacy else st.market.get(key))
+                        c.executemany(UPSERT_MAP, up)
+                        c.executemany(DELETE_MAP, rm)
+                        n += sum(len(r[-1]) for r in up)
+                        if key in self.legacy:
+                            c.execute(DELETE_KV, (key,))
+                    else:
+                        row = dumps(v)
+                        c.execute(UPSERT_KV, (key, row))
+                        n += len(row)
+                for key, d in rec.get("delta", {}).items():
+                    if key in self.legacy:
+                        # como arriba: la sección entera
+                        v = dict(st.market.get(key) or {})
+                        v.update(d["set"])
+                        for k in d["del"]:
+                            v.pop(k, None)
+                        up, rm = self._market_rows(key, v, None)
+                        c.execute(DELETE_KV, (key,))
+                    else:
+                        up, rm = [(key, k, dumps(v)) for k, v in d["set"].items()], [(key, k) for k in d["del"]]
+                    c.executemany(UPSERT_MAP, up)
+                    c.executemany(DELETE_MAP, rm)
+                    n += sum(len(r[-1]) for r in up)
+                c.executemany(INSERT_LEDGER, [tuple(e.get(k) for k in LEDGER_COLS) for e in rec.get("ledger", ())])
+                if AUDIT:
+                    c.execute(INSERT_AUDIT, (rec["ts"], dumps(rec)))
+                c.execute("COMMIT")
+                metrics.file_io("write", self.path, n, t0)   # bytes = datos de las filas escritas
+                self.legacy.difference_update(k for k, v in rec["market"].items() if isinstance(v, dict))
+                self.legacy.difference_update(rec.get("delta", ()))
+                return n
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    def checkpoint(self, st, dirty):
+        # reescritura completa (solo tras replace_players/replace_teams o al importar)
+        with self.lock:
+            c = self.db
+            c.execute("BEGIN")
+            try:
+                if "players" in dirty:
+                    c.execute("DELETE FROM players")
+                    c.executemany(UPSERT_PLAYER, [self._player_row(p, i) for i, p in enumerate(st.players)])
+                if "teams" in dirty:
+                    c.execute("DELETE FROM teams")
+                    c.executemany(UPSERT_TEAM, [self._team_row(t, i) for i, t in enumerate(st.teams)])
+                if "market" in dirty:
+                    c.execute("DELETE FROM market_map")
+                    c.execute("DELETE FROM market_kv")
+                    for key, v in st.market.items():
+                        if isinstance(v, dict):
+                            c.executemany(UPSERT_MAP, [(key, k, dumps(x)) for k, x in v.items()])
+                        else:
+                            c.execute(UPSERT_KV, (key, dumps(v)))
+                c.execute("COMMIT")
+                if "market" in dirty:
+                    self.legacy.clear()
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    def append_history(self, entries):
+        with self.lock:
+            t0 = time.perf_counter()
+            rows = [(e.get("date",""), norm(e.get("player")), norm(e.get("buyer")), norm(e.get("seller")), dumps(e)) for e in entries]
+            c = self.db
+            c.execute("BEGIN")
+            c.executemany(INSERT_HIST, rows)
+            c.execute("COMMIT")
+            metrics.file_io("write", self.path, sum(len(r[-1]) for r in rows), t0)
+
+    def append_ledger(self, entries):
+        with self.lock:
+            c = self.db
+            c.execute("BEGIN")
+            c.executemany(INSERT_LEDGER, [tuple(e.get(k) for k in LEDGER_COLS) for e in entries])
+            c.execute("COMMIT")
+
+    def iter_audit(self):
+        for (d,) in self.db.execute("SELECT data FROM audit ORDER BY seq"):
+            yield json.loads(d)
+
+    def iter_ledger(self):
+        for row in self.db.execute("SELECT seq, ts, kind, src, dst, amount, ref FROM ledger ORDER BY seq"):
+            yield dict(zip(LEDGER_COLS, row))
+
+    def ledger_last_seq(self):
+        return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM ledger").fetchone()[0]
+
+    def iter_history(self, start=0):
+        cur = self.db.execute("SELECT data FROM history ORDER BY seq LIMIT -1 OFFSET ?", (start,))
+        for (d,) in cur:
+            yield json.loads(d)
+
+    def history_page(self, page, per_page, team=None, player=None, desde=None, hasta=None):
+        where, args = [], []
+        if team:
+            where.append("(buyer=? OR seller=?)")
+            args += [norm(team), norm(team)]
+        if player:
+            where.append("player=?")
+            args.append(norm(player))
+        if desde:
+            where.append("date>=?")
+            args.append(desde)
+        if hasta:
+            where.append("date<=?")
+            args.append(hasta + " 99")
+        w = (" WHERE " + " AND ".join(where)) if where else ""
+        with self.lock:
+            total = self.db.execute("SELECT COUNT(*) FROM history" + w, args).fetchone()[0]
+            pages = max(1, -(-total // per_page))
+            page = min(max(1, page), pages)
+            rows = self.db.execute("SELECT data FROM history" + w + " ORDER BY seq DESC LIMIT ? OFFSET ?",
+                                   args + [per_page, (page - 1) * per_page]).fetchall()
+        return [json.loads(d) for (d,) in rows], total, pages
+
+def import_json(base, db_path=None):
+    # importación de una sola vez: json (+ journal pendiente + historial) -> liga.db
+    import store
+    src = store.Store(base, backend=JsonBackend(base)).ensure()
+    db_path = db_path or os.path.join(base, "liga.db")
+    dst = SqliteBackend(db_path)
+    dst.checkpoint(src, {"players", "teams", "market"})
+    with dst.lock:
+        dst.db.execute("DELETE FROM history")
+    batch = []
+    for e in src.backend.iter_history():
+        batch.append(e)
+        if len(batch) >= 1000:
+            dst.append_history(batch)
+            batch = []
+    if batch:
+        dst.append_history(batch)
+    with dst.lock:
+        dst.db.execute("DELETE FROM ledger")
+    dst.append_ledger(list(src.backend.iter_ledger()) + src.ledger.unflushed)
+    with dst.lock:
+        dst.db.execute("DELETE FROM audit")
+        dst.db.executemany(INSERT_AUDIT, ((r.get("ts"), dumps(r)) for r in src.backend.iter_audit()))
+    return db_path
+
+if __name__ == "__main__":
+    # python storage.py importar [ruta/liga.db]
+    if len(sys.argv) >= 2 and sys.argv[1] == "importar":
+        path = import_json(os.path.dirname(os.path.abspath(__file__)), sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"Importado en {path}. Pon \"STORAGE\": \"sqlite\" en config.json.")
+    else:
+        print("Uso: python storage.py importar [ruta/liga.db]")
@@ -0,0 +1,430 @@
+# store.py
+# estado de la liga residente en memoria: jugadores, equipos y mercado se leen UNA vez del disco
+# y se indexan por nombre normalizado / id / rol de capitán.
+# persistencia (storage.py): cada transacción se confirma de una vez en el backend.
+#  - json: UNA línea en journal.jsonl (write-ahead, fsync); cuando el journal pesa tanto como la
+#    última foto (o CHECKPOINT_EVERY transacciones) los json se reescriben con tmp + rename y el
+#    journal pasa al historial de auditoría (storage.py). Así cada escritura cuesta lo que su delta
+#    y las fotos, repartidas, como mucho otro tanto.
+#  - sqlite: upsert de las filas tocadas en una transacción de la base de datos
+# de las secciones del mercado tocadas entrada a entrada (Tx.entry / put_entry / del_entry) solo va
+# al disco el delta: {"delta": {sección: {"set": {clave: valor}, "del": [clave]}}}; una puja escribe
+# su subasta, no todas.
+import os, threading, copy, time, contextvars, math
+from contextlib import contextmanager
+import auction, economy, offers, search, storage
+
+BASE = os.path.dirname(__file__)
+CHECKPOINT_EVERY = 1000        # transacciones como mucho entre fotos (tiempo de arranque)
+CHECKPOINT_BYTES = 256 * 1024  # journal mínimo antes de una foto
+STORAGE = "json"   # "json" | "sqlite" (config.json -> STORAGE)
+MARKET_DEFAULT = {"open":False,"auctions":{},"offers":{},"private_offers":{},"private_seq":0,"dueños":{},"daily_seen":{}}
+
+def norm(s):
+    return (s or "").strip().lower()
+
+def normalize_market(m):
+    m = m or {}
+    # mercado.json antiguo usaba "mercado_abierto"
+    if "mercado_abierto" in m and "open" not in m:
+        m["open"] = bool(m.pop("mercado_abierto"))
+    offers.normalize(m)
+    for k, v in MARKET_DEFAULT.items():
+        m.setdefault(k, copy.deepcopy(v))
+    for auc in m["auctions"].values():
+        auction.normalize(auc)
+    return m
+
+def finite(rec):
+    # NaN/inf no caben en céntimos (economy.cents) ni en un json válido: un registro con ellos
+    # no se puede aplicar, así que no se guarda (ni se rehace del journal)
+    stack = [rec]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, float):
+            if not math.isfinite(x):
+                return False
+        elif isinstance(x, dict):
+            stack.extend(x.values())
+        elif isinstance(x, (list, tuple)):
+            stack.extend(x)
+    return True
+
+def copy_rec(d):
+    # copia de un registro (jugador/equipo) para que nadie mute el estado sin pasar por put_*
+    if d is None:
+        return None
+    return {k: (list(v) if isinstance(v, list) else dict(v) if isinstance(v, dict) else v) for k, v in d.items()}
+
+class Tx:
+    # cambios pendientes de una transacción; nada toca el estado hasta el commit
+    def __init__(self, st):
+        self.st = st
+        self.players = {}   # id -> registro nuevo
+        self.teams = {}     # id -> registro nuevo
+        self.m = {}         # sección de mercado -> valor nuevo
+        self.shallow = {}   # sección -> claves ya copiadas (el resto aún compartido con el estado)
+        self.ledger = []    # movimientos de dinero (economy.py)
+        self.released = set()  # subastas ya resueltas aquí: sus retenciones no cuentan
+        self.aborted = False
+
+    def abort(self):
+        # descarta todo lo hecho en la transacción (dry-run)
+        self.aborted = True
+
+    def put_player(self, p):
+        if p["id"] not in self.st.p_pos:
+            return False
+        self.players[p["id"]] = copy_rec(p)
+        return True
+
+    def put_team(self, t):
+        if t["id"] not in self.st.t_pos:
+            return False
+        self.teams[t["id"]] = copy_rec(t)
+        return True
+
+    def section(self, key):
+        # copia de trabajo de una sección del mercado (auctions, offers, dueños...)
+        if key not in self.m:
+            self.m[key] = copy.deepcopy(self.st.market.get(key))
+        elif key in self.shallow:
+            done = self.shallow.pop(key)
+            sec = self.m[key]
+            for k in sec:
+                if k not in done:
+                    sec[k] = copy.deepcopy(sec[k])
+        return self.m[key]
+
+    def entry(self, section, key):
+        # copia de trabajo de UNA entrada (p.ej. una subasta) sin copiar la sección entera
+        if section not in self.m:
+            self.m[section] = dict(self.st.market.get(section) or {})
+            self.shallow[section] = set()
+        sec = self.m[section]
+        done = self.shallow.get(section)
+        if done is not None and key not in done and key in sec:
+            sec[key] = copy.deepcopy(sec[key])
+            done.add(key)
+        return sec.get(key)
+
+    def del_entry(self, section, key):
+        self.entry(section, key)
+        self.m[section].pop(key, None)
+
+    def put_entry(self, section, key, value):
+        self.entry(section, key)
+        self.m[section][key] = value
+        if section in self.shallow:
+            self.shallow[section].add(key)
+
+    def record(self):
+        market, delta = {}, {}
+        for k, v in self.m.items():
+            done = self.shallow.get(k)
+            if done is None:
+                market[k] = v   # sección entera (tx.section o valor simple)
+            else:
+                delta[k] = {"set": {x: v[x] for x in done if x in v}, "del": [x for x in done if x not in v]}
+        rec = {"ts": time.time(), "players": self.players, "teams": self.teams, "market": market}
+        if delta:
+            rec["delta"] = delta
+        if self.ledger:
+            rec["ledger"] = self.ledger
+        return rec
+
+class Store:
+    def __init__(self, base=BASE, backend=None):
+        self.base = base
+        self.backend = backend
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.dirty = set()
+        self.pending = 0
+        self.pending_bytes = 0   # journal escrito desde la última foto
+        self.snapshot_bytes = 0  # lo que ocupó la última foto
+        self.tx = None
+        self.tx_owner = None
+        self.expiries = None   # heap de vencimientos de subastas, lo construye market
+        self.inbox = None      # índices de ofertas privadas (offers.Inbox), también de market
+        self.book = None       # índices de ofertas públicas (offers.Book), también de market
+        self.roles_version = 0 # cambia cuando cambian los roles de capitán (caché de roles.py)
+        self.names_index = None  # search.Index de nombres de jugador, se hace al primer uso
+        self.pool = None       # elegibles del mercado diario (daily.Pool), lo construye market
+        self.ledger = economy.Ledger()
+
+    def load(self):
+        with self.lock:
+            if self.backend is None:
+                self.backend = storage.open_backend(self.base, STORAGE)
+            players, teams, market, recs = self.backend.load()
+            self.players, self.teams = players, teams
+            self.market = normalize_market(market)
+            self.reindex()
+            self.dirty.clear()
+            self.pending = 0
+            self.ledger = economy.Ledger(self.backend.ledger_last_seq())
+            self.ledger.reset_balances(self.teams)
+            economy.sync_holds(self.ledger, {}, self.market["auctions"], self.team_id_of_role)
+            # rehace lo que quedó en el journal desde el último checkpoint; un registro que no se
+            # puede aplicar se salta entero (apply valida antes de cambiar nada) y la foto de abajo
+            # lo saca del journal, en vez de no cargar
+            skipped = 0
+            for rec in recs:
+                try:
+                    if not finite(rec):
+                        raise ValueError("número no válido (NaN/inf)")
+                    self.apply(rec)
+                except Exception as e:
+                    print(f"[store] {self.base}: transacción del journal descartada ({rec.get('ts')}): {e!r}")
+                    skipped += 1
+                    continue
+                self.pending += 1
+            self.pending_bytes = getattr(self.backend, "journal_bytes", 0)
+            self.expiries = None
+            self.inbox = None
+            self.book = None
+            self.loaded = True
+            if skipped:
+                self.dirty.update(("players", "teams", "market"))
+                self.checkpoint()
+            if not self.ledger.seq:
+                economy.open_accounts(self)
+
+    def ensure(self):
+        if not self.loaded:
+            self.load()
+        return self
+
+    def reindex(self):
+        self.names_index = None
+        self.pool = None
+        self.p_pos, self.p_by_id, self.p_by_name = {}, {}, {}
+        for i, p in enumerate(self.players):
+            self.p_pos[p["id"]] = i
+            self._index_player(p)
+        self.t_pos, self.t_by_id, self.t_by_role = {}, {}, {}
+        for i, t in enumerate(self.teams):
+            self.t_pos[t["id"]] = i
+            self._index_team(t)
+        self.roles_version += 1
+
+    # setdefault: igual que el scan lineal de antes, gana la primera coincidencia
+    def _index_player(self, p):
+        self.p_by_id.setdefault(norm(p["id"]), p)
+        self.p_by_name.setdefault(norm(p["name"]), p)
+
+    def _unindex_player(self, p):
+        if self.p_by_id.get(norm(p["id"])) is p: del self.p_by_id[norm(p["id"])]
+        if self.p_by_name.get(norm(p["name"])) is p: del self.p_by_name[norm(p["name"])]
+
+    def _index_team(self, t):
+        self.t_by_id.setdefault(norm(t["id"]), t)
+        if t.get("captain_role"):
+            self.t_by_role.setdefault(norm(t["captain_role"]), t)
+
+    def _unindex_team(self, t):
+        if self.t_by_id.get(norm(t["id"])) is t: del self.t_by_id[norm(t["id"])]
+        if t.get("captain_role") and self.t_by_role.get(norm(t["captain_role"])) is t:
+            del self.t_by_role[norm(t["captain_role"])]
+
+    # -------- lecturas O(1) (devuelven copias) --------
+    def current_tx(self):
+        # solo el hilo dueño de la transacción ve sus cambios sin confirmar
+        if self.tx is not None and self.tx_owner == threading.get_ident():
+            return self.tx
+        return None
+
+    def _view_p(self, p):
+        tx = self.current_tx()
+        if p is not None and tx is not None:
+            p = tx.players.get(p["id"], p)
+        return copy_rec(p)
+
+    def _view_t(self, t):
+        tx = self.current_tx()
+        if t is not None and tx is not None:
+            t = tx.teams.get(t["id"], t)
+        return copy_rec(t)
+
+    def player_by_name(self, name):
+        return self._view_p(self.p_by_name.get(norm(name)))
+
+    def player_by_id(self, pid):
+        return self._view_p(self.p_by_id.get(norm(pid)))
+
+    def team_by_id(self, team_id):
+        return self._view_t(self.t_by_id.get(norm(team_id)))
+
+    def team_by_role(self, role_name):
+        return self._view_t(self.t_by_role.get(norm(role_name)))
+
+    def team_id_of_role(self, role_name):
+        t = self.t_by_role.get(norm(role_name))
+        return t["id"] if t else None
+
+    def name_index(self):
+        # búsqueda aproximada (search.py) sobre los nombres confirmados
+        idx = self.names_index
+        if idx is None:
+            idx = self.names_index = search.Index(p["name"] for p in self.players)
+        return idx
+
+    def market_section(self, key):
+        tx = self.current_tx()
+        if tx is not None and key in tx.m:
+            return tx.m[key]
+        return self.market.get(key)
+
+    # -------- transacciones --------
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.current_tx() is not None:
+                # anidada (p.ej. transfer dentro de close_market): se une a la de fuera
+                yield self.tx
+                return
+            self.tx, self.tx_owner = Tx(self), threading.get_ident()
+            try:
+                yield self.tx
+                if not self.tx.aborted:
+                    self.commit(self.tx)
+            finally:
+                self.tx, self.tx_owner = None, None
+
+    def commit(self, tx):
+        if not (tx.players or tx.teams or tx.m or tx.ledger):
+            return
+        rec = tx.record()
+        if not finite(rec):
+            # antes de escribir: una línea así en el journal impediría cargar la liga
+            raise ValueError("transacción con un número no válido (NaN/inf), descartada")
+        n = self.backend.commit(rec, self)
+        self.apply(rec)
+        if not self.backend.journaled:
+            self.dirty.clear()   # ya está en disco
+            return
+        self.pending += 1
+        self.pending_bytes += n or 0
+        if self.pending >= CHECKPOINT_EVERY or self.pending_bytes >= max(CHECKPOINT_BYTES, self.snapshot_bytes):
+            self.checkpoint()
+
+    def prepare(self, rec):
+        # todo lo que puede fallar con un registro mal formado, sin tocar el estado: así un
+        # registro del journal que no se puede aplicar no deja media transacción (Store.load)
+        players = []
+        for p in rec.get("players", {}).values():
+            i = self.p_pos.get(p["id"])
+            if i is not None:
+                norm(p["name"])
+                players.append((i, p))
+        teams = []
+        for t in rec.get("teams", {}).values():
+            i = self.t_pos.get(t["id"])
+            if i is not None:
+                norm(t.get("captain_role"))
+                teams.append((i, t, economy.cents(t.get("budget"))))
+        market = dict(rec.get("market", {}))
+        for k, d in rec.get("delta", {}).items():
+            v = dict(self.market.get(k) or {})
+            v.update(d["set"])
+            for x in d["del"]:
+                v.pop(x, None)
+            market[k] = v
+        if "auctions" in market:
+            old = self.market.get("auctions") or {}
+            for name, auc in market["auctions"].items():
+                top = None if old.get(name) is auc else auc.get("top")
+                if top:
+                    norm(top["captain_role"])
+                    economy.cents(top["amount"])
+        ledger = [e for e in rec.get("ledger", ()) if int(e["seq"]) > self.ledger.seq]
+        return players, teams, market, ledger
+
+    def apply(self, rec):
+        players, teams, market, ledger = self.prepare(rec)
+        for i, p in players:
+            if self.players[i]["name"] != p["name"]:
+                self.names_index = None
+            self._unindex_player(self.players[i])
+            self.players[i] = p
+            self._index_player(p)
+            if self.pool is not None:
+                self.pool.update(i, p)
+            self.dirty.add("players")
+        for i, t, budget in teams:
+            if self.teams[i].get("captain_role") != t.get("captain_role"):
+                self.roles_version += 1
+            self._unindex_team(self.teams[i])
+            self.teams[i] = t
+            self._index_team(t)
+            self.ledger.set_balance(t["id"], budget)
+            self.dirty.add("teams")
+        for k, v in market.items():
+            if k == "auctions":
+                economy.sync_holds(self.ledger, self.market.get(k) or {}, v, self.team_id_of_role)
+            self.market[k] = v
+            self.dirty.add("market")
+        # las de antes de un crash a mitad de checkpoint ya están en el libro (prepare las quita)
+        for e in ledger:
+            self.ledger.apply(e)
+            if self.backend.journaled:
+                self.ledger.unflushed.append(e)
+
+    def checkpoint(self):
+        with self.lock:
+            # primero el libro: si se corta aquí, el journal aún tiene las entradas (se saltan por seq)
+            if self.ledger.unflushed:
+                self.backend.append_ledger(self.ledger.unflushed)
+                self.ledger.unflushed = []
+            if self.dirty:
+                self.snapshot_bytes = self.backend.checkpoint(self, self.dirty) or self.snapshot_bytes
+            self.dirty.clear()
+            self.pending = 0
+            self.pending_bytes = 0
+
+    # -------- escrituras sueltas (cada una es su propia transacción) --------
+    def put_player(self, player):
+        with self.transaction() as tx:
+            return tx.put_player(player)
+
+    def put_team(self, team):
+        with self.transaction() as tx:
+            return tx.put_team(team)
+
+    def replace_players(self, players):
+        with self.lock:
+            self.players = list(players)
+            self.reindex()
+            self.dirty.add("players")
+            self.checkpoint()
+
+    def replace_teams(self, teams):
+        with self.lock:
+            self.teams = list(teams)
+            self.reindex()
+            self.ledger.reset_balances(self.teams)
+            self.dirty.add("teams")
+            self.checkpoint()
+
+    flush = checkpoint
+
+STATE = Store()
+# liga activa en este contexto (la pone leagues.enter por comando); si no hay, la de BASE
+CURRENT = contextvars.ContextVar("store", default=None)
+
+def current():
+    return CURRENT.get() or STATE
+
+def use(st):
+    CURRENT.set(st)
+
+def get():
+    return current().ensure()
+
+def reload():
+    # para cuando un admin edita los json a mano con el bot encendido
+    # (el journal pendiente se vuelve a aplicar encima)
+    st = current()
+    with st.lock:
+        st.load()
@@ -1,83 +1,72 @@
 # teams.py
-import json, os
+import store, economy
 
-BASE = os.path.dirname(__file__)
-JUG_FILE = os.path.join(BASE, "jugadores.json")
-TEAMS_FILE = os.path.join(BASE, "equipos.json")
-
-def read_json(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def write_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# todo pasa por el estado en memoria de store.py: las lecturas ya no tocan disco
+# y las escrituras van a la transacción en curso (o a una propia si no hay ninguna)
 
 def load_players():
-    return read_json(JUG_FILE)
+    # lista viva: solo lectura, para cambiar algo usar update_player
+    return store.get().players
 
 def save_players(data):
-    write_json(JUG_FILE, data)
+    st = store.get()
+    st.replace_players(data)
+    st.flush()
 
 def load_teams():
-    return read_json(TEAMS_FILE)
+    return store.get().teams
 
 def save_teams(data):
-    write_json(TEAMS_FILE, data)
+    st = store.get()
+    st.replace_teams(data)
+    st.flush()
 
 def find_player_by_name(name):
-    for p in load_players():
-        if p["name"].strip().lower() == name.strip().lower():
-            return p
-    return None
+    return store.get().player_by_name(name)
+
+def resolve_player(query):
+    # (jugador, sugerencias): acepta el nombre sin acentos o a medias si no hay duda
+    name, suggestions = store.get().name_index().resolve(query)
+    return (find_player_by_name(name) if name else None), suggestions
+
+def names_by_id():
+    return {p["id"]: p["name"] for p in store.get().players}
 
 def find_player_by_id(pid):
-    for p in load_players():
-        if p["id"].lower() == pid.lower():
-            return p
-    return None
+    return store.get().player_by_id(pid)
 
 def get_team_by_captain_role(role_name):
-    for t in load_teams():
-        if t["captain_role"].strip().lower() == role_name.strip().lower():
-            return t
-    return None
+    return store.get().team_by_role(role_name)
 
 def get_team_by_id(team_id):
-    for t in load_teams():
-        if t["id"] == team_id or t["id"].strip().lower() == team_id.strip().lower():
-            return t
-    return None
+    return store.get().team_by_id(team_id)
 
 def update_player(player):
-    players = load_players()
-    for i,p in enumerate(players):
-        if p["id"] == player["id"]:
-            players[i] = player
-            save_players(players)
-            return True
-    return False
+    return store.get().put_player(player)
+
+def update_players(players):
+    # varios en una sola transacción: se guardan todos o ninguno
+    with store.get().transaction() as tx:
+        return [tx.put_player(p) for p in players]
 
 def update_team(updated):
-    teams = load_teams()
-    for i,t in enumerate(teams):
-        if t["id"] == updated["id"]:
-            teams[i] = updated
-            save_teams(teams)
-            return True
-    return False
-
-def transfer_player_by_name(player_name, seller_team_id, buyer_team_id, price):
-    # returns True on success, "limite" if buyer reached 3 fichajes, or False on error
+    return store.get().put_team(updated)
+
+def transfer_player_by_name(player_name, seller_team_id, buyer_team_id, price, hold_key=None):
+    # returns True on success, "limite" if buyer reached 3 fichajes,
+    # "presupuesto" if buyer can't pay, or False on error
+    with store.get().transaction():
+        return _transfer(player_name, seller_team_id, buyer_team_id, price, hold_key)
+
+def _transfer(player_name, seller_team_id, buyer_team_id, price, hold_key=None):
     player = find_player_by_name(player_name)
     if not player:
         return False
     if player.get("blinded"):
         return False
-    teams = load_teams()
     seller = get_team_by_id(seller_team_id)
     buyer = get_team_by_id(buyer_team_id)
-    if not seller or not buyer:
+    if not seller or not buyer or seller["id"] == buyer["id"]:
         return False
     # buyer fichajes limit
     if buyer.get("fichajes_hechos",0) >= 3:
@@ -85,9 +74,11 @@ def transfer_player_by_name(player_name, seller_team_id, buyer_team_id, price):
     # check player in seller
     if player["name"] not in seller["players"]:
         return False
-    # transfer money
-    seller["budget"] = round(seller.get("budget",0) + price, 2)
-    buyer["budget"] = round(buyer.get("budget",0) - price, 2)
+    # transfer money (céntimos + entrada en el libro, economy.py)
+    st = store.get()
+    if not economy.can_pay(st, buyer, price, hold_key):
+        return "presupuesto"
+    economy.pay(st.current_tx(), buyer, seller, price, "traspaso", player["name"])
     # move player
     seller["players"].remove(player["name"])
     buyer["players"].append(player["name"])
@@ -95,14 +86,18 @@ def transfer_player_by_name(player_name, seller_team_id, buyer_team_id, price):
     player["team"] = buyer["id"]
     # increment fichajes
     buyer["fichajes_hechos"] = buyer.get("fichajes_hechos",0) + 1
-    # save
+    # save: todo va a la misma transacción -> una línea de journal
     update_player(player)
     update_team(seller)
     update_team(buyer)
     return True
 
-def buy_player_free(player_name, buyer_team_id, price):
+def buy_player_free(player_name, buyer_team_id, price, hold_key=None):
     # if player was free (no seller) – same as transfer but seller is None
+    with store.get().transaction():
+        return _buy_free(player_name, buyer_team_id, price, hold_key)
+
+def _buy_free(player_name, buyer_team_id, price, hold_key=None):
     player = find_player_by_name(player_name)
     if not player or player.get("blinded"):
         return False
@@ -111,8 +106,11 @@ def buy_player_free(player_name, buyer_team_id, price):
         return False
     if buyer.get("fichajes_hechos",0) >= 3:
         return "limite"
-    # pay price (no seller)
-    buyer["budget"] = round(buyer.get("budget",0) - price,2)
+    # pay price (no seller): el dinero va a la liga
+    st = store.get()
+    if not economy.can_pay(st, buyer, price, hold_key):
+        return "presupuesto"
+    economy.pay(st.current_tx(), buyer, None, price, "compra", player["name"])
     buyer["players"].append(player["name"])
     player["team"] = buyer["id"]
     buyer["fichajes_hechos"] = buyer.get("fichajes_hechos",0) + 1
@@ -1,20 +1,34 @@
 # utils.py
-import json, os
-BASE = os.path.dirname(__file__)
-HIST = os.path.join(BASE,"historial.json")
+import time
+import store
+
+# historial de fichajes: lo guarda el backend de la liga (storage.py)
+#  - json: historial.jsonl append-only con índice de offsets
+#  - sqlite: tabla history indexada por fecha/equipo/jugador
 
 def save_hist(entry):
-    if not os.path.exists(HIST):
-        with open(HIST,"w",encoding="utf-8") as f:
-            json.dump([],f)
-    with open(HIST,"r",encoding="utf-8") as f:
-        data = json.load(f)
-    data.append(entry)
-    with open(HIST,"w",encoding="utf-8") as f:
-        json.dump(data,f, indent=2, ensure_ascii=False)
+    save_hist_many([entry])
+
+def save_hist_many(entries):
+    # todo el lote en un solo append
+    if not entries:
+        return
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    batch = []
+    for e in entries:
+        e = dict(e)
+        e.setdefault("date", now)
+        batch.append(e)
+    store.get().backend.append_history(batch)
+
+def iter_hist(start=0):
+    # generador: no carga el historial entero en memoria
+    return store.get().backend.iter_history(start)
 
 def read_hist():
-    if not os.path.exists(HIST):
-        return []
-    with open(HIST,"r",encoding="utf-8") as f:
-        return json.load(f)
+    return list(iter_hist())
+
+def hist_page(page=1, per_page=15, team=None, player=None, desde=None, hasta=None):
+    # devuelve (entradas, total, paginas); lo más reciente primero.
+    # desde/hasta: "YYYY-MM-DD" (inclusive)
+    return store.get().backend.history_page(page, per_page, team=team, player=player, desde=desde, hasta=hasta)
@@ -0,0 +1,128 @@
+# valuation.py
+# valor y cláusula de los jugadores calculados por la liga (en vez de uno a uno con !asignar_valores).
+# Todo va en arrays de numpy sobre la tabla de jugadores, una pasada para todos:
+#  - update(): tras cada cierre (market.py) -> los vendidos se acercan a su precio de venta
+#    (media móvil con peso alpha) y los que se quedaron sin pujas bajan unsold_decay
+#  - rebuild(): desde el historial entero -> media de los precios de venta con más peso a los
+#    recientes (la mitad cada half_life_days), mezclada con el valor actual (prior_weight)
+# Capitanes y blindados no se tocan; un jugador sin valor (0) solo lo recibe al venderse.
+# Las reglas se pueden cambiar en config.json -> "VALUATION".
+import time
+import numpy as np
+
+AUTO = True   # revalorar en cada cierre (config.json -> AUTO_VALUATION)
+RULES = {
+    "alpha": 0.5,            # peso del precio de venta en update()
+    "unsold_decay": 0.1,     # lo que baja un jugador que nadie ha pujado
+    "half_life_days": 30,    # rebuild(): una venta de hace half_life_days pesa la mitad
+    "prior_weight": 1.0,     # rebuild(): peso del valor actual frente a las ventas
+    "min_value": 1.0,
+    "max_value": None,
+    "clause_mult": 1.5,
+    "decimals": 1,
+}
+
+def norm(s):
+    return (s or "").strip().lower()
+
+def clause_of(value, rules=None):
+    r = rules or RULES
+    return round(float(value) * r["clause_mult"], 2)
+
+class Table:
+    # columnas de la tabla de jugadores
+    def __init__(self, players):
+        self.players = players
+        self.pos = {norm(p["name"]): i for i, p in enumerate(players)}
+        self.value = np.array([float(p.get("value") or 0) for p in players], dtype=float)
+        self.clause = np.array([float(p.get("clause") or 0) for p in players], dtype=float)
+        self.fixed = np.array([bool(p.get("captain") or p.get("blinded")) for p in players], dtype=bool)
+
+    def index(self, names):
+        # posiciones de los nombres que existen (y a qué elemento de names corresponde cada una)
+        hits = [(self.pos.get(norm(n)), k) for k, n in enumerate(names)]
+        hits = [(i, k) for i, k in hits if i is not None]
+        return (np.array([i for i, _ in hits], dtype=int), np.array([k for _, k in hits], dtype=int))
+
+    def finish(self, new, touched, rules):
+        # aplica límites y redondeo; devuelve [(id, valor, cláusula)] de los que cambian
+        lo = rules["min_value"] or 0
+        hi = rules["max_value"] if rules["max_value"] is not None else np.inf
+        touched = touched & ~self.fixed
+        new = np.where(new > 0, np.clip(new, lo, hi), 0.0)
+        new = np.where(touched, np.round(new, rules["decimals"]), self.value)
+        clause = np.where(touched, np.round(new * rules["clause_mult"], 2), self.clause)
+        changed = np.flatnonzero(touched & ((new != self.value) | (clause != self.clause)))
+        return [(self.players[i]["id"], float(new[i]), float(clause[i])) for i in changed]
+
+def update(players, results, unsold=(), rules=None):
+    # incremental: solo los jugadores de este cierre
+    r = dict(RULES, **(rules or {}))
+    t = Table(players)
+    new = t.value.copy()
+    touched = np.zeros(len(players), dtype=bool)
+
+    i, k = t.index([x["player"] for x in results])
+    if len(i):
+        price = np.array([float(x["price"]) for x in results], dtype=float)[k]
+        old = t.value[i]
+        new[i] = np.where(old > 0, old + r["alpha"] * (price - old), price)
+        touched[i] = True
+
+    cold = [u["player"] for u in unsold if u.get("reason") == "sin pujas"]
+    i, _ = t.index(cold)
+    # los que ya están en el mínimo (o por debajo, puestos a mano) no bajan: finish() los subiría
+    i = i[t.value[i] > (r["min_value"] or 0)]
+    if len(i):
+        new[i] = t.value[i] * (1 - r["unsold_decay"])
+        touched[i] = True
+    return t.finish(new, touched, r)
+
+def _stamp(date, now):
+    try:
+        d = np.datetime64(date, "s")
+    except ValueError:
+        return now
+    return now if np.isnat(d) else float(d.astype("int64"))
+
+def _stamps(dates, now):
+    # "AAAA-MM-DD HH:MM:SS" (utils.save_hist) -> segundos; sin fecha válida cuenta como reciente
+    try:
+        d = np.array(dates, dtype="datetime64[s]")
+    except ValueError:
+        # alguna fecha rara: una a una
+        return np.array([_stamp(x, now) for x in dates], dtype=float)
+    return np.where(np.isnat(d), now, d.astype("int64").astype(float))
+
+def rebuild(players, history, now=None, rules=None):
+    # desde cero con el historial: media de ventas ponderada por antigüedad
+    r = dict(RULES, **(rules or {}))
+    now = time.time() if now is None else now
+    t = Table(players)
+    names, prices, dates = [], [], []
+    for e in history:
+        try:
+            price = float(e.get("price"))
+        except (TypeError, ValueError):
+            continue
+        if price > 0 and e.get("player"):
+            names.append(e["player"])
+            prices.append(price)
+            dates.append(e.get("date") or "")
+    i, k = t.index(names)
+    n = len(players)
+    if len(i):
+        price = np.array(prices, dtype=float)[k]
+        age = np.maximum(now - _stamps(dates, now)[k], 0) / 86400
+        w = 0.5 ** (age / r["half_life_days"])
+        wsum = np.bincount(i, weights=w, minlength=n)
+        psum = np.bincount(i, weights=w * price, minlength=n)
+    else:
+        wsum = psum = np.zeros(n)
+    seen = wsum > 0
+    kp = r["prior_weight"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        blended = np.where(t.value > 0, (kp * t.value + psum) / (kp + wsum), psum / wsum)
+    new = np.where(seen, blended, t.value)
+    # solo los que tienen ventas: al resto se le deja el valor que tenga (aunque sea a mano)
+    return t.finish(new, seen & ~t.fixed, r)
@@ -0,0 +1,74 @@
+# worker.py
+# market/teams/utils hacen I/O bloqueante: aquí se ejecutan en UN hilo escritor aparte
+# para no parar el event loop de discord (heartbeats, comandos de otros capitanes...).
+# con varias ligas (leagues.py) cada una tiene su hilo y sus locks
+import asyncio, contextvars, time
+from contextlib import asynccontextmanager
+from store import norm
+import leagues, metrics
+
+def fn_name(fn):
+    return f"{getattr(fn, '__module__', '?')}.{getattr(fn, '__name__', '?')}"
+
+async def run(fn, *args, **kwargs):
+    # await worker.run(market.pujar, nombre, rol, 10)
+    # métricas: espera en la cola del hilo de la liga y duración de la función
+    loop = asyncio.get_running_loop()
+    lg = leagues.resolve()
+    ctx = contextvars.copy_context()
+    name, queued = fn_name(fn), time.perf_counter()
+    def call():
+        t0 = time.perf_counter()
+        metrics.observe("worker_queue_ms", (t0 - queued) * 1000)
+        try:
+            return ctx.run(fn, *args, **kwargs)
+        finally:
+            metrics.observe("worker_call_ms", (time.perf_counter() - t0) * 1000, fn=name)
+    # mientras haya llamadas en curso la liga no se descarga (leagues.evict_idle)
+    lg.active += 1
+    try:
+        return await loop.run_in_executor(lg.executor, call)
+    finally:
+        lg.active -= 1
+
+class TimedLock(asyncio.Lock):
+    # asyncio.Lock que apunta cuánto se ha esperado por él (por tipo de recurso)
+    def __init__(self, kind):
+        super().__init__()
+        self.kind = kind
+
+    async def acquire(self):
+        t0 = time.perf_counter()
+        try:
+            return await super().acquire()
+        finally:
+            metrics.observe("lock_wait_ms", (time.perf_counter() - t0) * 1000, kind=self.kind)
+
+def lock(kind, key):
+    # un asyncio.Lock por recurso ("auction", "Xabi"), ("player", ...), ("team", ...)
+    table = leagues.resolve().locks
+    k = (kind, norm(key))
+    l = table.get(k)
+    if l is None:
+        l = TimedLock(kind)
+        table[k] = l
+    return l
+
+@asynccontextmanager
+async def locked(*resources):
+    # varios recursos a la vez, siempre en el mismo orden para no hacer deadlock
+    ls = [lock(kind, key) for kind, key in sorted(set((k, norm(v)) for k, v in resources))]
+    for l in ls:
+        await l.acquire()
+    try:
+        yield
+    finally:
+        for l in reversed(ls):
+            l.release()
+
+def shutdown():
+    # al cerrar el bot (bot.py, tras bot.run): lo pendiente de cada liga a disco y fuera los hilos
+    for lg in leagues.loaded():
+        if lg.store.loaded:
+            lg.executor.submit(lg.store.checkpoint).result()
+        lg.executor.shutdown(wait=True)